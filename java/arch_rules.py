@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import json
+import sys
+
+import instrument
+from cli_helper import *
+from core import *
+from reachability import JavaReachabilityIndex, check_rules, parse_rules
+
+
+def get_reachability_index(class_map, impl_map):
+    # A class depending on an interface may reach any of its implementations.
+    with instrument.phase('get_dependency'):
+        graph = get_proj_dependency_graph(class_map, impl_map, all_impls=True)
+    with instrument.phase('build_reachability_index'):
+        return JavaReachabilityIndex(graph)
+
+
+def check_arch_rules(rules, proj_dir, max_sources=None, **class_map_options):
+    """
+    Check the forbidden dependency rules of reachability.parse_rules against the project.
+
+    :return: violations of reachability.check_rules
+    """
+    # The dependency only needs the class headers.
+    with instrument.phase('get_proj_class_map'):
+        class_map = get_proj_class_map(proj_dir, lazy_methods=True, **class_map_options)
+    with instrument.phase('get_impl_map'):
+        impl_map = get_impl_map(class_map)
+    index = get_reachability_index(class_map, impl_map)
+    with instrument.phase('check_rules'):
+        return check_rules(index, rules, max_sources)
+
+
+def main():
+    parser = build_arg_parser('Check the forbidden dependencies between Java classes, e.g. as architecture rules.')
+    parser.add_argument('rules_file', help='file of the "source pattern -> target pattern" rules, one per line, a '
+                                           'pattern is a class or a package ending with .*')
+    parser.add_argument('proj_dir', help='analyse project directory')
+    parser.add_argument('--max-sources', type=int, help='count of the violating classes to report of every rule, no '
+                                                        'limit if it\'s not given')
+    parser.add_argument('-o', '--output', help='file of the violations in JSON, they are printed if it\'s not given')
+    args = parser.parse_args()
+    setup_logging(args)
+    setup_instrument(args)
+    proj_dir = args.proj_dir
+    if not args.rules_file or not proj_dir:
+        logging.error('rules file or project dir is empty')
+        sys.exit(-1)
+    with open(args.rules_file) as f:
+        rules = parse_rules(f)
+    if args.daemon:
+        res = request_daemon(args, 'check_rules', rules=rules, max_sources=args.max_sources)
+    else:
+        res = check_arch_rules(rules, proj_dir, args.max_sources, **get_class_map_options(args))
+    write_instrument_report(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(res, f, indent=4)
+    else:
+        print(json.dumps(res, indent=4))
+    # The violations fail the CI.
+    sys.exit(1 if res else 0)
+
+
+if __name__ == '__main__':
+    main()
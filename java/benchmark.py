@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from core import *
+from npe_checker import process_null_pointer
+from ut_gen import ut_gen_by_class_map
+
+BENCH_BASE_PACKAGE = 'com.bench'
+# Bump this if the layout of the suite result changes.
+BENCH_RESULT_VERSION = 2
+
+
+def _get_package_name(package_index, package_depth=1):
+    # Every 4 packages share a parent package on each nesting level.
+    parents = ['n%d' % (package_index // 4 ** (package_depth - i)) for i in range(1, package_depth)]
+    return '.'.join([BENCH_BASE_PACKAGE] + parents + ['p%d' % package_index])
+
+
+def _get_class_name(class_index):
+    return 'Class%d' % class_index
+
+
+def _get_interface_name(class_index):
+    return 'IClass%d' % class_index
+
+
+def _has_interface(class_index, interface_ratio):
+    # Spread the interfaces evenly without consuming the random numbers.
+    return int((class_index + 1) * interface_ratio) > int(class_index * interface_ratio)
+
+
+def _get_field_candidates(class_index, class_count, layers):
+    if not layers:
+        return 0, class_count
+    # Fields only reference the classes of the next layer, like controller -> service -> dao.
+    layer = class_index * layers // class_count
+    if layer == layers - 1:
+        return 0, 0
+    return (layer + 1) * class_count // layers, (layer + 2) * class_count // layers
+
+
+def _build_method_lines(rnd, method_index, fields, body_lines):
+    res = ['    public String method%d(String arg0, int arg1) {' % method_index,
+           '        String s0 = arg0 + arg1;']
+    for i in range(body_lines):
+        if fields and rnd.random() < 0.5:
+            field_name = rnd.choice(fields)[1]
+            res.append('        String s%d = %s.method%d(s%d, %d);' % (i + 1, field_name, i % 2, i, i))
+        else:
+            res.append('        String s%d = s%d.trim() + "%d;{";' % (i + 1, i, i))
+    res += ['        return s%d;' % body_lines, '    }']
+    return res
+
+
+def _build_interface_lines(class_index, package, methods_count):
+    res = ['package %s;' % package, '', 'public interface %s {' % _get_interface_name(class_index)]
+    res += ['    String method%d(String arg0, int arg1);' % i for i in range(methods_count)]
+    res.append('}')
+    return res
+
+
+def _build_class_lines(rnd, class_index, class_packages, classes_per_package, fields_count, methods_count,
+                       body_lines, wildcard_import_ratio, interface_ratio=0, layers=0):
+    package = class_packages[class_index]
+    start, end = _get_field_candidates(class_index, len(class_packages), layers)
+    field_indices = sorted({rnd.randrange(start, end) for _ in range(fields_count)} - {class_index}) \
+        if start < end else []
+    imports = set()
+    fields = []
+    for e in field_indices:
+        # The fields are declared by the interfaces if there are.
+        field_class = _get_interface_name(e) if _has_interface(e, interface_ratio) else _get_class_name(e)
+        if class_packages[e] != package:
+            if rnd.random() < wildcard_import_ratio:
+                imports.add('%s.*' % class_packages[e])
+            else:
+                imports.add('%s.%s' % (class_packages[e], field_class))
+        fields.append((field_class, 'field%d' % e))
+    res = ['package %s;' % package, '']
+    res += ['import %s;' % e for e in sorted(imports)]
+    res += ['', '/**', ' * Generated class %d of %d per package.' % (class_index, classes_per_package), ' */']
+    if _has_interface(class_index, interface_ratio):
+        res += ['public class %s implements %s {' % (_get_class_name(class_index), _get_interface_name(class_index))]
+    else:
+        res += ['public class %s {' % _get_class_name(class_index)]
+    res += ['    private %s %s;' % e for e in fields]
+    for i in range(methods_count):
+        res.append('')
+        res += _build_method_lines(rnd, i, fields, body_lines)
+    res.append('}')
+    return res
+
+
+def _write_lines(file_name, lines):
+    with open(file_name, 'w') as f:
+        f.writelines(map(lambda x: '%s\n' % x, lines))
+
+
+def generate_java_project(proj_dir, class_count=100, classes_per_package=20, fields_count=3, methods_count=5,
+                          body_lines=5, wildcard_import_ratio=0.3, seed=0, package_depth=1, interface_ratio=0,
+                          layers=0):
+    """
+    Generate a deterministic synthetic Java project, every class has private fields of the other classes and
+    public methods invoking the methods of these fields.
+
+    :param package_depth: count of the package levels under BENCH_BASE_PACKAGE
+    :param interface_ratio: ratio of the classes implementing an interface, which declares the fields of them
+    :param layers: count of the layers whose classes only have the fields of the next layer, 0 means no layers
+    :return: the source directory of the generated project
+    """
+    rnd = random.Random(seed)
+    class_packages = [_get_package_name(i // classes_per_package, package_depth) for i in range(class_count)]
+    source_dir = os.path.join(proj_dir, 'src', 'main', 'java')
+    for i in range(class_count):
+        package_dir = os.path.join(source_dir, *class_packages[i].split('.'))
+        if not os.path.isdir(package_dir):
+            os.makedirs(package_dir)
+        lines = _build_class_lines(rnd, i, class_packages, classes_per_package, fields_count, methods_count,
+                                   body_lines, wildcard_import_ratio, interface_ratio, layers)
+        _write_lines(os.path.join(package_dir, '%s.java' % _get_class_name(i)), lines)
+        if _has_interface(i, interface_ratio):
+            _write_lines(os.path.join(package_dir, '%s.java' % _get_interface_name(i)),
+                         _build_interface_lines(i, class_packages[i], methods_count))
+    return source_dir
+
+
+def _time_call(func, *args, **kwargs):
+    start = time.time()
+    res = func(*args, **kwargs)
+    return time.time() - start, res
+
+
+def bench_parse_scaling(sizes, wildcard_import_ratio, repeat):
+    """
+    Time the full parse of projects in different sizes, the time per class should stay flat if the parse is linear.
+    """
+    print('%10s %12s %16s' % ('classes', 'parse (s)', 'per class (ms)'))
+    for size in sizes:
+        proj_dir = tempfile.mkdtemp(prefix='deepcode_bench_')
+        try:
+            generate_java_project(proj_dir, class_count=size, wildcard_import_ratio=wildcard_import_ratio)
+            cost = min(_time_call(get_proj_class_map, proj_dir)[0] for _ in range(repeat))
+        finally:
+            shutil.rmtree(proj_dir)
+        print('%10d %12.3f %16.3f' % (size, cost, cost * 1000.0 / size))
+
+
+def _get_slots(obj):
+    return [e for c in type(obj).__mro__ for e in getattr(c, '__slots__', ()) if hasattr(obj, e)]
+
+
+def get_deep_size(obj):
+    """
+    Size in bytes of the object and all the objects reachable from it, the shared objects are only counted once.
+    """
+    res = 0
+    visited = set()
+    stack = [obj]
+    while stack:
+        e = stack.pop()
+        if id(e) in visited or isinstance(e, type):
+            continue
+        visited.add(id(e))
+        res += sys.getsizeof(e)
+        if isinstance(e, dict):
+            stack.extend(e.keys())
+            stack.extend(e.values())
+        elif isinstance(e, (list, tuple, set, frozenset)):
+            stack.extend(e)
+        if hasattr(e, '__dict__'):
+            stack.append(e.__dict__)
+        stack.extend(getattr(e, x) for x in _get_slots(e))
+    return res
+
+
+def bench_memory(sizes, methods_count, body_lines):
+    """
+    Measure the memory of the class map after the method dependencies are set up.
+    """
+    print('%10s %10s %14s %16s %17s' % ('classes', 'methods', 'total (MB)', 'per class (KB)', 'per method (KB)'))
+    for size in sizes:
+        proj_dir = tempfile.mkdtemp(prefix='deepcode_bench_')
+        try:
+            generate_java_project(proj_dir, class_count=size, methods_count=methods_count, body_lines=body_lines)
+            class_map = get_proj_class_map(proj_dir)
+            setup_class_map_method_dep(class_map)
+        finally:
+            shutil.rmtree(proj_dir)
+        methods = sum(len(e.methods) for e in class_map.values())
+        total = get_deep_size(class_map)
+        print('%10d %10d %14.2f %16.2f %17.2f' % (size, methods, total / 1024.0 / 1024.0, total / 1024.0 / size,
+                                                  total / 1024.0 / max(methods, 1)))
+
+
+def bench_method_index(class_count, methods_count, body_lines, repeat):
+    """
+    Time setup_class_map_method_dep on the classes with many methods, whose self method lookups dominate.
+    """
+    proj_dir = tempfile.mkdtemp(prefix='deepcode_bench_')
+    try:
+        generate_java_project(proj_dir, class_count=class_count, methods_count=methods_count, body_lines=body_lines)
+        class_map = get_proj_class_map(proj_dir)
+    finally:
+        shutil.rmtree(proj_dir)
+    cost = min(_time_call(setup_class_map_method_dep, class_map)[0] for _ in range(repeat))
+    print('%10s %10s %18s %17s' % ('classes', 'methods', 'method dep (s)', 'per method (ms)'))
+    print('%10d %10d %18.3f %17.3f' % (class_count, class_count * methods_count, cost,
+                                       cost * 1000.0 / (class_count * methods_count)))
+
+
+def build_fluent_statement(tokens_count):
+    """
+    Build a builder chain statement of about tokens_count tokens, e.g. b.with(arg0, wrap(x0)).with(arg1, wrap(x1));
+    """
+    calls = ['.with(arg%d, wrap(x%d))' % (i, i) for i in range(max(1, (tokens_count - 3) // 3))]
+    return 'Result result = builder%s.build();' % ''.join(calls)
+
+
+def bench_fluent(sizes, repeat):
+    """
+    Time the variable and method lookup of the long fluent statements, which should grow linearly by the tokens.
+    """
+    print('%10s %12s %16s' % ('tokens', 'lookup (ms)', 'per token (us)'))
+    for size in sizes:
+        method = JavaMethodEntity(package=BENCH_BASE_PACKAGE, class_name='Fluent', ret_type='Result',
+                                  method_name='build', method_body={'raw': [(1, build_fluent_statement(size))]})
+        class_map = {'%s.Fluent' % BENCH_BASE_PACKAGE: JavaClassEntity(package=BENCH_BASE_PACKAGE, name='Fluent',
+                                                                       class_package_map={}, methods=[method])}
+        cost = min(_time_call(setup_class_map_method_dep, class_map)[0] for _ in range(repeat))
+        print('%10d %12.3f %16.3f' % (size, cost * 1000.0, cost * 1000000.0 / size))
+
+
+def _build_diff_map(start_packages, proj_dir):
+    # Every line of the start classes is changed.
+    res = {}
+    for package in start_packages:
+        for file_name in get_dir_java_files(package):
+            with open(file_name) as f:
+                res[os.path.relpath(file_name, proj_dir)] = range(1, len(f.readlines()) + 1)
+    return res
+
+
+def run_suite(proj_settings, workers=1, start_package_count=1):
+    """
+    Generate a synthetic project and time every phase of the analyses on it separately.
+
+    :param proj_settings: keyword arguments of generate_java_project
+    :param workers: count of the parse processes
+    :param start_package_count: count of the first packages which are traced, checked and tested
+    :return: JSON serializable result, the checks are whether the incremental results are the ones of a full
+        analysis
+    """
+    proj_dir = tempfile.mkdtemp(prefix='deepcode_bench_')
+    target_dir = tempfile.mkdtemp(prefix='deepcode_bench_ut_')
+    try:
+        source_dir = generate_java_project(proj_dir, **proj_settings)
+        package_depth = proj_settings.get('package_depth', 1)
+        start_packages = [os.path.join(source_dir, *_get_package_name(i, package_depth).split('.'))
+                          for i in range(start_package_count)]
+        phases = OrderedDict()
+        phases['get_proj_class_map'], class_map = _time_call(get_proj_class_map, proj_dir, workers=workers)
+        phases['setup_class_map_method_dep'], _ = _time_call(setup_class_map_method_dep, class_map)
+        phases['get_impl_map'], impl_map = _time_call(get_impl_map, class_map)
+        # The start classes are parsed again without a change, e.g. the files touched by a checkout.
+        modified = [e for package in start_packages for e in get_dir_java_files(package)]
+        phases['update_proj_class_map'], _ = _time_call(update_proj_class_map, class_map, proj_dir, modified=modified,
+                                                        impl_map=impl_map, setup_method_dep=True, workers=workers)
+        checks = OrderedDict([('update_impl_map', impl_map == get_impl_map(class_map))])
+        phases['get_dependency'], _ = _time_call(get_dependency, start_packages, class_map, impl_map)
+        diff_map = _build_diff_map(start_packages, proj_dir)
+        phases['process_null_pointer'], _ = _time_call(process_null_pointer, class_map, diff_map)
+        phases['ut_gen'], _ = _time_call(ut_gen_by_class_map, start_packages, class_map, impl_map, target_dir)
+    finally:
+        shutil.rmtree(proj_dir)
+        shutil.rmtree(target_dir)
+    return OrderedDict([
+        ('version', BENCH_RESULT_VERSION),
+        ('parser_version', JAVA_PARSER_VERSION),
+        ('python', platform.python_version()),
+        ('settings', OrderedDict(sorted(dict(proj_settings, workers=workers,
+                                             start_package_count=start_package_count).items()))),
+        ('counts', OrderedDict([
+            ('classes', len(class_map)),
+            ('interfaces', len([e for e in class_map.values() if e.class_type == 1])),
+            ('methods', sum(len(e.methods) for e in class_map.values())),
+        ])),
+        ('phases', phases),
+        ('checks', checks),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of deepcode on synthetic Java projects.')
+    sub_parsers = parser.add_subparsers(dest='bench')
+    parse_scaling = sub_parsers.add_parser('parse-scaling', help='full parse time by the project size')
+    parse_scaling.add_argument('--sizes', default='500,1000,2000,4000', help='comma separated class counts')
+    parse_scaling.add_argument('--wildcard-import-ratio', type=float, default=0.3)
+    parse_scaling.add_argument('--repeat', type=int, default=1)
+    memory = sub_parsers.add_parser('memory', help='memory of the class map by the project size')
+    memory.add_argument('--sizes', default='500,1000,2000', help='comma separated class counts')
+    memory.add_argument('--methods', type=int, default=5, help='methods per class')
+    memory.add_argument('--body-lines', type=int, default=5, help='lines per method body')
+    method_index = sub_parsers.add_parser('method-index', help='method dependency setup of the classes with many '
+                                                               'methods')
+    method_index.add_argument('--classes', type=int, default=5)
+    method_index.add_argument('--methods', type=int, default=400, help='methods per class')
+    method_index.add_argument('--body-lines', type=int, default=5, help='lines per method body')
+    method_index.add_argument('--repeat', type=int, default=3)
+    fluent = sub_parsers.add_parser('fluent', help='variable lookup of the long fluent statements')
+    fluent.add_argument('--sizes', default='100,500,1000,2000', help='comma separated token counts')
+    fluent.add_argument('--repeat', type=int, default=3)
+    suite = sub_parsers.add_parser('suite', help='time of every analysis phase, printed in JSON')
+    suite.add_argument('--classes', type=int, default=1000)
+    suite.add_argument('--classes-per-package', type=int, default=20)
+    suite.add_argument('--package-depth', type=int, default=2)
+    suite.add_argument('--fields', type=int, default=3, help='fields per class')
+    suite.add_argument('--methods', type=int, default=5, help='methods per class')
+    suite.add_argument('--body-lines', type=int, default=5, help='lines per method body')
+    suite.add_argument('--wildcard-import-ratio', type=float, default=0.3)
+    suite.add_argument('--interface-ratio', type=float, default=0.3)
+    suite.add_argument('--layers', type=int, default=4, help='0 lets the fields reference any class, the '
+                                                            'dependency trees could be huge then')
+    suite.add_argument('--seed', type=int, default=0)
+    suite.add_argument('--start-packages', type=int, default=1, help='count of the analysed packages')
+    suite.add_argument('-j', '--workers', type=int, default=1)
+    suite.add_argument('-o', '--output', help='also write the result to the JSON file')
+    args = parser.parse_args()
+    if args.bench == 'parse-scaling':
+        bench_parse_scaling([int(e) for e in args.sizes.split(',')], args.wildcard_import_ratio, args.repeat)
+    elif args.bench == 'memory':
+        bench_memory([int(e) for e in args.sizes.split(',')], args.methods, args.body_lines)
+    elif args.bench == 'method-index':
+        bench_method_index(args.classes, args.methods, args.body_lines, args.repeat)
+    elif args.bench == 'fluent':
+        bench_fluent([int(e) for e in args.sizes.split(',')], args.repeat)
+    elif args.bench == 'suite':
+        proj_settings = {
+            'class_count': args.classes,
+            'classes_per_package': args.classes_per_package,
+            'package_depth': args.package_depth,
+            'fields_count': args.fields,
+            'methods_count': args.methods,
+            'body_lines': args.body_lines,
+            'wildcard_import_ratio': args.wildcard_import_ratio,
+            'interface_ratio': args.interface_ratio,
+            'layers': args.layers,
+            'seed': args.seed,
+        }
+        res = json.dumps(run_suite(proj_settings, args.workers, args.start_packages), indent=4)
+        print(res)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(res)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+from array import array
+
+from core import *
+
+
+def _build_csr(node_count, edges):
+    """
+    Compressed sparse rows of the edges, the targets of node i are targets[offsets[i]:offsets[i + 1]].
+
+    :param edges: array of the flattened (source, target) pairs
+    :return: (offsets, targets)
+    """
+    offsets = array('i', [0] * (node_count + 1))
+    for i in range(0, len(edges), 2):
+        offsets[edges[i] + 1] += 1
+    for i in range(node_count):
+        offsets[i + 1] += offsets[i]
+    targets = array('i', [0] * (len(edges) // 2))
+    pos = array('i', offsets[:-1])
+    for i in range(0, len(edges), 2):
+        targets[pos[edges[i]]] = edges[i + 1]
+        pos[edges[i]] += 1
+    return offsets, targets
+
+
+class JavaCallGraph(object):
+    """
+    Method calls between the project classes. A node is (class key, method name, count of params) like the keys of
+    JavaMethodIndex, and the edges are kept in integer arrays by the node indices.
+    """
+
+    def __init__(self, nodes, edges):
+        """
+        :param nodes: node tuples, the index of a node in the list is its node index
+        :param edges: array of the flattened (caller, callee) node index pairs without duplicates
+        """
+        self.nodes = nodes
+        self.node_indices = {e: i for i, e in enumerate(nodes)}
+        self._callee_offsets, self._callees = _build_csr(len(nodes), edges)
+        reversed_edges = array('i', [0] * len(edges))
+        reversed_edges[0::2] = edges[1::2]
+        reversed_edges[1::2] = edges[0::2]
+        self._caller_offsets, self._callers = _build_csr(len(nodes), reversed_edges)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get_node_index(self, class_key, method_name, param_count):
+        return self.node_indices.get((class_key, method_name, param_count))
+
+    def _walk(self, node, offsets, targets, max_depth):
+        index = self.node_indices.get(tuple(node))
+        if index is None:
+            return []
+        visited = {index}
+        level = [index]
+        res = []
+        depth = 0
+        while level and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_level = []
+            for i in level:
+                for j in targets[offsets[i]:offsets[i + 1]]:
+                    if j not in visited:
+                        visited.add(j)
+                        res.append(self.nodes[j])
+                        next_level.append(j)
+            level = next_level
+        return res
+
+    def get_callees(self, node, max_depth=1):
+        """
+        :param node: (class key, method name, count of params)
+        :param max_depth: count of the call levels to follow, no limit if it's None
+        :return: nodes called by the method directly or indirectly, breadth first
+        """
+        return self._walk(node, self._callee_offsets, self._callees, max_depth)
+
+    def get_callers(self, node, max_depth=1):
+        """
+        :param node: (class key, method name, count of params)
+        :param max_depth: count of the call levels to follow, no limit if it's None
+        :return: nodes calling the method directly or indirectly, breadth first
+        """
+        return self._walk(node, self._caller_offsets, self._callers, max_depth)
+
+
+def _get_method_vars(method):
+    for name in ('external_vars', 'local_vars'):
+        for v in method.method_body.get(name, {}).values():
+            yield v
+
+
+def get_call_graph(class_map, impl_map):
+    """
+    Build the call graph of the project methods in one pass, whose method dependencies are set up by
+    setup_class_map_method_dep. A call of a field, a param or a local variable is resolved by its class type, and the
+    call of an interface method is also a call of the method of every implementation.
+
+    :param class_map: JavaClassMap of the project
+    :param impl_map: result of get_impl_map
+    :return: JavaCallGraph
+    """
+    nodes = []
+    node_indices = {}
+    for key, entity in class_map.items():
+        for method_key in entity.method_index.key_method_map:
+            node_indices[(key, ) + method_key] = len(nodes)
+            nodes.append((key, ) + method_key)
+    edges = array('i')
+    for key, entity in class_map.items():
+        for method_key, method in entity.method_index.key_method_map.items():
+            if not method.method_body:
+                continue
+            caller = node_indices[(key, ) + method_key]
+            callees = set()
+            for e in method.method_body.get('self_methods', ()):
+                callees.add(node_indices.get((key, ) + e))
+            for v in _get_method_vars(method):
+                if not v.get('invoke_methods'):
+                    continue
+                class_type = clear_generics(v['class_type'])
+                if class_type not in class_map:
+                    continue
+                class_types = [class_type]
+                if class_map[class_type].class_type == 1:
+                    class_types += impl_map.get(class_type, [])
+                for c in class_types:
+                    for e in v['invoke_methods']:
+                        callees.add(node_indices.get((c, ) + e))
+            callees.discard(None)
+            for e in sorted(callees):
+                edges.append(caller)
+                edges.append(e)
+    return JavaCallGraph(nodes, edges)
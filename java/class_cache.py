@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import os
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+# Bump this if the layout of the cache file changes.
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.deepcode', 'cache')
+
+
+class ClassMapCacheEntry(object):
+    def __init__(self, mtime=None, size=None, content_hash=None, scopes_digest=None, entity=None):
+        self.mtime = mtime  # Modification time of the file when it was parsed
+        self.size = size  # Size of the file when it was parsed
+        self.content_hash = content_hash  # md5 of the file content
+        self.scopes_digest = scopes_digest  # Digest of the project classes visible through the imported packages
+        self.entity = entity  # Parsed JavaClassEntity, None if the file has no class
+
+
+class ClassMapCache(object):
+    """
+    On-disk cache of the parsed Java class entities of one project.
+
+    An entry is reused if the file has the same mtime and size, or the same content hash, as when it was parsed and
+    the project classes visible through its own package and its wildcard imports haven't changed either.
+    """
+
+    def __init__(self, cache_file, parser_version):
+        self.cache_file = cache_file  # Path of the pickled cache file
+        self.parser_version = parser_version  # Version of the parser which produced the entries
+        self.entries = {}  # file path -> ClassMapCacheEntry
+        self.hits = 0
+        self.misses = 0
+        self._used = set()
+        self._dirty = False
+        self._package_index = None
+        self._scope_digests = {}
+
+    @staticmethod
+    def get_cache_file(cache_dir, proj_dir):
+        proj_hash = hashlib.md5(os.path.abspath(proj_dir).encode('utf-8')).hexdigest()
+        return os.path.join(cache_dir, '%s.pickle' % proj_hash)
+
+    def load(self):
+        if not os.path.isfile(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            logging.warning('failed to load class map cache %s: %s' % (self.cache_file, e))
+            return
+        if data.get('format_version') != CACHE_FORMAT_VERSION or data.get('parser_version') != self.parser_version:
+            logging.info('class map cache %s is outdated, ignore it' % self.cache_file)
+            self._dirty = True
+            return
+        self.entries = data['entries']
+
+    def save(self):
+        if not self._dirty and len(self._used) == len(self.entries):
+            return
+        # Files which are not visited in this run have been deleted or are out of the project now.
+        entries = {k: v for k, v in self.entries.items() if k in self._used}
+        data = {
+            'format_version': CACHE_FORMAT_VERSION,
+            'parser_version': self.parser_version,
+            'entries': entries,
+        }
+        cache_dir = os.path.dirname(self.cache_file)
+        tmp_file = '%s.%d.tmp' % (self.cache_file, os.getpid())
+        try:
+            if cache_dir and not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_file, self.cache_file)
+        except (IOError, OSError) as e:
+            logging.warning('failed to save class map cache %s: %s' % (self.cache_file, e))
+            return
+        self.entries = entries
+        self._dirty = False
+
+    def bind_package_index(self, package_index):
+        """
+        Bind the package index of the project, which decides the imported classes of every file.
+        """
+        self._package_index = package_index
+        self._scope_digests = {}
+
+    def _get_scope_digest(self, package):
+        if package not in self._scope_digests:
+            classes = sorted(self._package_index.get_classes(package).values()) if self._package_index else []
+            self._scope_digests[package] = hashlib.md5('\n'.join(classes).encode('utf-8')).hexdigest()
+        return self._scope_digests[package]
+
+    def _get_scopes_digest(self, entity):
+        if not entity:
+            return None
+        scopes = sorted(set(filter(lambda x: x, [entity.package] + list(entity.wildcard_packages))))
+        return hashlib.md5(','.join(map(self._get_scope_digest, scopes)).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _get_content_hash(file_name):
+        with open(file_name, 'rb') as f:
+            return hashlib.md5(f.read()).hexdigest()
+
+    def get(self, file_name, file_stat=None):
+        """
+        Get the cached entity of the file.
+
+        :param file_name: Java file path
+        :param file_stat: os.stat result of the file, it would be read if not given
+        :return: (hit, entity)
+        """
+        entry = self.entries.get(file_name)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        if file_stat is None:
+            file_stat = os.stat(file_name)
+        if entry.mtime != file_stat.st_mtime or entry.size != file_stat.st_size:
+            if entry.size != file_stat.st_size or entry.content_hash != self._get_content_hash(file_name):
+                self.misses += 1
+                return False, None
+            # Only touched, keep the entry but remember the new stat.
+            entry.mtime = file_stat.st_mtime
+            if entry.entity is not None:
+                entry.entity.update_file_stat(file_stat)
+            self._dirty = True
+        if entry.scopes_digest != self._get_scopes_digest(entry.entity):
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self._used.add(file_name)
+        return True, entry.entity
+
+    def put(self, file_name, entity, file_stat=None):
+        if file_stat is None:
+            file_stat = os.stat(file_name)
+        self.entries[file_name] = ClassMapCacheEntry(mtime=file_stat.st_mtime, size=file_stat.st_size,
+                                                     content_hash=self._get_content_hash(file_name),
+                                                     scopes_digest=self._get_scopes_digest(entity), entity=entity)
+        self._used.add(file_name)
+        self._dirty = True
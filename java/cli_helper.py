@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import argparse
+import logging
+import os
+import sys
+
+import daemon_client
+import instrument
+from class_cache import DEFAULT_CACHE_DIR
+from core import DEFAULT_IGNORE_DIRS
+
+
+def build_arg_parser(description):
+    """
+    Build the argument parser with the options shared by all the command line tools.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help='directory of the parsed Java class cache (default: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true', help='parse all the Java files without the cache')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='count of the processes parsing the Java files, 0 means the count of CPUs (default: 1)')
+    parser.add_argument('--ignore-dirs', default=','.join(sorted(DEFAULT_IGNORE_DIRS)),
+                        help='comma separated directory names which are not walked unless they have a pom.xml or '
+                             'build.gradle (default: %(default)s)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the info logs, e.g. cache hits')
+    parser.add_argument('--report', metavar='FILE',
+                        help='write the JSON report of the phase times, the max RSS and the counters to the file')
+    parser.add_argument('--report-top-files', type=int, default=instrument.DEFAULT_TOP_FILES,
+                        help='count of the slowest parsed files in the report (default: %(default)s)')
+    parser.add_argument('--daemon', metavar='ADDRESS',
+                        help='send the request to the analysis daemon of daemon.py listening on the Unix socket path '
+                             'or host:port instead of parsing the project')
+    return parser
+
+
+def setup_logging(args):
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s %(levelname)s %(message)s')
+
+
+def setup_instrument(args):
+    if args.report:
+        instrument.enable(args.report_top_files)
+
+
+def write_instrument_report(args):
+    if args.report:
+        instrument.write_report(args.report)
+        logging.info('instrumentation report is written to %s' % args.report)
+
+
+def get_class_map_options(args):
+    """
+    Get the keyword arguments of core.get_proj_class_map from the parsed arguments.
+    """
+    return {
+        'cache_dir': None if args.no_cache else args.cache_dir,
+        'workers': args.workers,
+        'ignore_dirs': [e.strip() for e in args.ignore_dirs.split(',') if e.strip()],
+    }
+
+
+def add_class_filter_arguments(parser):
+    """
+    Add the options of the classes to analyse. The includes select the start classes, the excluded classes are
+    skipped before they're expanded or analysed.
+    """
+    parser.add_argument('--include', help='comma separated packages, classes or globs of the class keys, e.g. '
+                                          'com.a,com.b.*Service, only their classes in the start packages are '
+                                          'analysed')
+    parser.add_argument('--exclude', help='comma separated packages, classes or globs of the class keys, their '
+                                          'classes are neither analysed nor expanded')
+    parser.add_argument('--include-regex', help='only analyse the classes in the start packages whose keys match the '
+                                                'regex')
+    parser.add_argument('--exclude-regex', help='neither analyse nor expand the classes whose keys match the regex')
+
+
+def _split_patterns(value):
+    return [e.strip() for e in value.split(',') if e.strip()] if value else None
+
+
+def get_class_filter_options(args):
+    """
+    Get the keyword arguments of core.get_class_filter from the parsed arguments of add_class_filter_arguments.
+    """
+    return {
+        'include': _split_patterns(args.include),
+        'exclude': _split_patterns(args.exclude),
+        'include_regex': args.include_regex,
+        'exclude_regex': args.exclude_regex,
+    }
+
+
+def get_abs_path(path):
+    # The daemon has its own working directory.
+    return os.path.abspath(path) if path else path
+
+
+def request_daemon(args, command, **params):
+    """
+    Send the command of the project to the daemon of the --daemon option, exit if it failed.
+    """
+    res = daemon_client.request(args.daemon, command, proj_dir=get_abs_path(args.proj_dir), **params)
+    if res is None:
+        sys.exit(-1)
+    return res
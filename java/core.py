@@ -1,19 +1,39 @@
 # coding=utf-8
+import bisect
+import fnmatch
 import logging
+import multiprocessing
 import os
 import re
+import stat
+import time
 
-from collections import OrderedDict
+from collections import OrderedDict, deque, namedtuple
+
+import instrument
+from class_cache import ClassMapCache
+from lexer import *
+
+try:
+    from os import scandir as _os_scandir
+except ImportError:
+    try:
+        from scandir import scandir as _os_scandir
+    except ImportError:
+        _os_scandir = None
+
+try:
+    from sys import intern as _intern
+except ImportError:
+    _intern = intern
 
-CODE_COMMENT_REGEX = re.compile(r'/\*.*?\*/')
 GENERICS_REGEX = re.compile(r'[a-zA-Z]*<(.*?)>')
 QUOTE_REGEX = re.compile(r'"(.*?)"')
 SINGLE_QUOTE_REGEX = re.compile(r'\'(.*?)\'')
 BRACKET_REGEX = re.compile(r'\((.*?)\)')
-METHOD_LINE_SPLIT_REGEX = re.compile(r'[^a-zA-Z0-9_.\[\]]')
-QUOTE_SEMICOLON_PLACE_HOLDER = 'QUOTE_SEMICOLON_PLACE_HOLDER'
-QUOTE_LEFT_BRACKET_PLACE_HOLDER = 'QUOTE_LEFT_BRACKET_PLACE_HOLDER'
-QUOTE_RIGHT_BRACKET_PLACE_HOLDER = 'QUOTE_RIGHT_BRACKET_PLACE_HOLDER'
+STATEMENT_TOKEN_REGEX = re.compile(r'[a-zA-Z0-9_.\[\]]+')
+OPERATOR_SPACE_REGEX = re.compile(r'\s*([.+\-*/,^!&|<>%])\s*')
+ELSE_REGEX = re.compile(r'\belse\b')
 GENERICS_COMMA_PLACE_HOLDER = 'GENERICS_COMMA_PLACE_HOLDER'
 SUPPORTED_JAVA_METHOD_MODIFIERS = {'public', 'private', 'static', 'protected', 'abstract', 'final', 'synchronized'}
 PRIMITIVE_TYPE = {'boolean', 'byte', 'char', 'short', 'int', 'long', 'float', 'double'}
@@ -27,47 +47,268 @@ JAVA_KEY_WORDS = {'abstract', 'continue', 'for', 'new', 'switch', 'assert', 'def
                   'instanceof', 'return', 'transient', 'catch', 'extends', 'int', 'short', 'try', 'char',
                   'final', 'interface', 'static', 'void', 'class', 'finally', 'long', 'volatile', 'const',
                   'float', 'native', 'super', 'while', 'null', 'true', 'false'}
+# Directory names which never contain the project sources, e.g. the build outputs.
+DEFAULT_IGNORE_DIRS = frozenset(['.git', '.svn', '.hg', '.idea', 'node_modules', 'target', 'build', 'out', 'bin',
+                                 'generated', 'generated-sources', 'generated-test-sources'])
+# Bump this if the parsed result of the Java files changes, so the cached class entities are invalidated.
+JAVA_PARSER_VERSION = 6
+JAVA_BUILD_FILES = frozenset(['pom.xml', 'build.gradle', 'build.gradle.kts'])
+
+
+class JavaLineTokens(namedtuple('JavaLineTokens', ['raw_line', 'line_spt', 'separated'])):
+    """
+    Tokens of one method body line, shared by the line infos of all the variables in the line.
+    """
+    __slots__ = ()
+
+
+class JavaLineInfo(namedtuple('JavaLineInfo', ['line_index', 'var_index', 'tokens'])):
+    """
+    Where a variable occurs, var_index is the index of the variable in tokens.line_spt.
+    """
+    __slots__ = ()
+
+    @property
+    def raw_line(self):
+        return self.tokens.raw_line
+
+    @property
+    def line_spt(self):
+        return self.tokens.line_spt
+
+    @property
+    def separated(self):
+        return self.tokens.separated
+
+
+def _intern_str(s):
+    # Only the byte strings can be interned in Python 2.
+    return _intern(s) if type(s) is str else s
+
+
+def _intern_list(l):
+    return [_intern_str(e) for e in l] if l else l
+
+
+def _intern_set(s):
+    return {_intern_str(e) for e in s} if s else s
+
+
+def _intern_map(m):
+    return {_intern_str(k): _intern_str(v) for k, v in m.items()}
+
+
+def _intern_map_values(m):
+    if not m:
+        return m
+    res = m.__class__()
+    for k, v in m.items():
+        res[k] = _intern_str(v)
+    return res
 
 
 # TODO: inner class support, now the method would be parsed only to the main class in a Java class file.
 # TODO: Python 3 support.
 
 class JavaMethodEntity(object):
-    def __init__(self, package=None, class_name=None, method_types=list(), ret_type=None,
-                 method_name=None, params=None, throws=list(), method_body=None, annotations=list()):
-        if params is None:
-            params = dict()
-        self.package = package  # Package name of the class of this method
-        self.class_name = class_name  # Class name of the class of this method
-        self.method_types = method_types  # Method modifiers
-        self.ret_type = ret_type  # Return type of this method
+    __slots__ = ('package', 'class_name', 'method_types', 'ret_type', 'method_name', 'params', 'throws', 'method_body',
+                 'annotations', 'dep_info')
+
+    def __init__(self, package=None, class_name=None, method_types=None, ret_type=None,
+                 method_name=None, params=None, throws=None, method_body=None, annotations=None):
+        self.package = _intern_str(package)  # Package name of the class of this method
+        self.class_name = _intern_str(class_name)  # Class name of the class of this method
+        self.method_types = method_types if method_types is not None else []  # Method modifiers
+        self.ret_type = _intern_str(ret_type)  # Return type of this method
         self.method_name = method_name  # Method name.
-        self.params = params  # Method params
-        self.throws = throws  # Method throws
+        self.params = params if params is not None else dict()  # Method params
+        self.throws = throws if throws is not None else []  # Method throws
         self.method_body = method_body  # Body of this method
-        self.annotations = annotations  # Method annotations
+        self.annotations = annotations if annotations is not None else []  # Method annotations
+        self.dep_info = None  # External variables of this method and its self methods, set by ut_gen
+
+    def __getstate__(self):
+        return tuple(getattr(self, e) for e in self.__slots__)
+
+    def __setstate__(self, state):
+        for k, v in zip(self.__slots__, state):
+            setattr(self, k, v)
+        # The unpickled strings are not interned.
+        self.package = _intern_str(self.package)
+        self.class_name = _intern_str(self.class_name)
+        self.method_types = _intern_set(self.method_types)
+        self.ret_type = _intern_str(self.ret_type)
+        self.params = _intern_map_values(self.params)
 
     def __str__(self):
         return '%s %s(%s)' % (self.ret_type, self.method_name, ','.join(map(lambda x: '%s %s' % (x[1], x[0]),
                                                                             self.params.items())))
 
 
+class JavaMethodIndex(object):
+    """
+    Lookup tables of the methods of one class, the method key is (method name, count of params).
+    """
+    __slots__ = ('key_method_map', 'name_methods_map', 'non_void_key_methods_map')
+
+    def __init__(self, methods):
+        self.key_method_map = {}  # Method key -> the last method of the key
+        self.name_methods_map = {}  # Method name -> methods
+        self.non_void_key_methods_map = {}  # Method key -> methods which don't return void
+        for e in methods:
+            key = (e.method_name, len(e.params))
+            self.key_method_map[key] = e
+            self.name_methods_map.setdefault(e.method_name, []).append(e)
+            if e.ret_type != 'void':
+                self.non_void_key_methods_map.setdefault(key, []).append(e)
+
+    def get_non_void_methods(self, method_keys):
+        return {e for k in method_keys for e in self.non_void_key_methods_map.get(k, ())}
+
+
 class JavaClassEntity(object):
+    __slots__ = ('package', 'name', 'class_type', 'class_package_map', 'parent', 'fields', 'interfaces', '_methods',
+                 'wildcard_packages', 'methods_location', '_method_index')
 
-    def __init__(self, package=None, name=None, class_type=None, class_package_map=None, parent=None, fields=list(),
-                 interfaces=list(), methods=list()):
-        self.package = package  # Package name
-        self.name = name  # Class name
+    def __init__(self, package=None, name=None, class_type=None, class_package_map=None, parent=None, fields=None,
+                 interfaces=None, methods=None, wildcard_packages=None):
+        self.package = _intern_str(package)  # Package name
+        self.name = _intern_str(name)  # Class name
         self.class_type = class_type  # Class type, 0 is normal Java class, 1 is Java interface
         self.class_package_map = class_package_map  # The class-package map imported by this class
-        self.parent = parent  # Parent class name
-        self.fields = fields  # Private or public fields class name
-        self.interfaces = interfaces  # Interface names implemented by this class
-        self.methods = methods  # Method entities of this class.
+        self.parent = _intern_str(parent)  # Parent class name
+        self.fields = fields if fields is not None else []  # Private or public fields class name
+        self.interfaces = interfaces if interfaces is not None else []  # Interface names implemented by this class
+        self.methods = methods if methods is not None else []  # Method entities of this class.
+        # Packages imported by "import xxx.*"
+        self.wildcard_packages = wildcard_packages if wildcard_packages is not None else []
+        # (file name, offset, line index, file size, file mtime) of the class declaration if the methods are lazy
+        self.methods_location = None
+
+    def __getstate__(self):
+        # The method index is rebuilt on demand.
+        return tuple(getattr(self, e) if e != '_method_index' else None for e in self.__slots__)
+
+    def __setstate__(self, state):
+        for k, v in zip(self.__slots__, state):
+            setattr(self, k, v)
+        # The unpickled strings are not interned.
+        self.package = _intern_str(self.package)
+        self.name = _intern_str(self.name)
+        self.parent = _intern_str(self.parent)
+        self.interfaces = _intern_list(self.interfaces)
+        self.wildcard_packages = _intern_list(self.wildcard_packages)
+        if self.class_package_map:
+            self.class_package_map = _intern_map(self.class_package_map)
+        if isinstance(self.fields, dict):
+            self.fields = {k: (_intern_str(c), eq) for k, (c, eq) in self.fields.items()}
+
+    def update_file_stat(self, file_stat):
+        """
+        Remember the new stat of the unchanged file, e.g. touched, so its lazy methods are still loaded by offset.
+
+        :param file_stat: os.stat result of the file
+        """
+        if self.methods_location:
+            self.methods_location = self.methods_location[:3] + (file_stat.st_size, file_stat.st_mtime)
+
+    @property
+    def methods(self):
+        # Lazy methods are only parsed on the first access.
+        if self._methods is None:
+            self._methods = _load_java_class_entity_methods(self)
+        return self._methods
+
+    @methods.setter
+    def methods(self, methods):
+        self._methods = methods
+        self._method_index = None
+
+    @property
+    def method_index(self):
+        # Built on the first access, the methods shouldn't be changed in place after that.
+        if self._method_index is None:
+            self._method_index = JavaMethodIndex(self.methods)
+        return self._method_index
+
+
+class JavaPackageIndex(object):
+    """
+    Package -> {class name: full class name} index of the project classes, which resolves the wildcard and the
+    same package imports without scanning all the project classes.
+    """
+
+    def __init__(self, class_packages=()):
+        self.package_classes = {}  # Package name -> {class name: full class name}
+        for e in class_packages:
+            self.add(e)
+
+    def add(self, full_class_name):
+        package, _, class_name = full_class_name.rpartition('.')
+        self.package_classes.setdefault(package, {})[class_name] = full_class_name
+
+    def remove(self, full_class_name):
+        package, _, class_name = full_class_name.rpartition('.')
+        classes = self.package_classes.get(package)
+        if classes is None:
+            return
+        classes.pop(class_name, None)
+        if not classes:
+            del self.package_classes[package]
+
+    def get_classes(self, package):
+        return self.package_classes.get(package, {})
+
+    def update_class_package_map(self, class_package_map, package):
+        class_package_map.update({e: package for e in self.get_classes(package)})
+
+
+class JavaClassMap(dict):
+    """
+    Class key -> JavaClassEntity map of a project, which also indexes the Java file of every class.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(JavaClassMap, self).__init__(*args, **kwargs)
+        self.path_key_map = {}  # Absolute file path -> class key, None if the file has no class
+        self.key_path_map = {}  # Class key -> absolute file path
+        self.package_index = None  # JavaPackageIndex the classes are parsed with
+        self.modules = []  # JavaModule list of the project
+
+    def add(self, file_name, entity):
+        file_name = os.path.abspath(file_name)
+        if not entity:
+            self.path_key_map[file_name] = None
+            return None
+        key = build_java_class_key(entity.package, entity.name)
+        self[key] = entity
+        self.path_key_map[file_name] = key
+        self.key_path_map[key] = file_name
+        return key
+
+    def remove(self, file_name):
+        """
+        Remove the class of the Java file.
+
+        :return: class key of the removed class, None if the file has no class
+        """
+        key = self.path_key_map.pop(os.path.abspath(file_name), None)
+        if key is None:
+            return None
+        # The class may have been taken over by another file.
+        if self.key_path_map.get(key) == os.path.abspath(file_name):
+            del self.key_path_map[key]
+            self.pop(key, None)
+        return key
 
+    def has_path(self, file_name):
+        return os.path.abspath(file_name) in self.path_key_map
 
-def _is_valid_java_file(file_dir):
-    return os.path.isfile(file_dir) and file_dir.endswith('.java')
+    def get_key_by_path(self, file_name):
+        return self.path_key_map.get(os.path.abspath(file_name))
+
+    def get_path_by_key(self, key):
+        return self.key_path_map.get(key)
 
 
 def _is_package_line(line):
@@ -147,13 +388,6 @@ def _clear_quotes(s):
     return SINGLE_QUOTE_REGEX.sub('0', QUOTE_REGEX.sub('0', s))
 
 
-def _replace_quote_bracket(line):
-    line = QUOTE_REGEX.sub(lambda x: x.group().replace('{', QUOTE_LEFT_BRACKET_PLACE_HOLDER)
-                           .replace('}', QUOTE_RIGHT_BRACKET_PLACE_HOLDER), line)
-    return SINGLE_QUOTE_REGEX.sub(lambda x: x.group().replace('{', QUOTE_LEFT_BRACKET_PLACE_HOLDER)
-                                  .replace('}', QUOTE_RIGHT_BRACKET_PLACE_HOLDER), line)
-
-
 def _complete_generics_package(s, package, class_package_map):
     if not s:
         return s
@@ -245,21 +479,168 @@ def build_java_class_key(package_name, class_name):
     return '%s.%s' % (package_name, class_name)
 
 
-def get_dir_java_files(directory):
-    if not directory or not os.path.exists(directory) or not os.path.isdir(directory):
+class _ListDirEntry(object):
+    """
+    Minimal os.DirEntry for the Python versions without os.scandir, e.g. Python 2.7 without the scandir package.
+    The entry is stat once, is_dir and is_file are answered by the same result.
+    """
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self._stat = None
+        self._mode = None
+
+    def _get_mode(self):
+        if self._mode is None:
+            try:
+                self._mode = self.stat().st_mode
+            except OSError:
+                # E.g. a broken symbolic link, which is neither a directory nor a file.
+                self._mode = 0
+        return self._mode
+
+    def is_dir(self):
+        return stat.S_ISDIR(self._get_mode())
+
+    def is_file(self):
+        return stat.S_ISREG(self._get_mode())
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+def _scandir(directory):
+    if _os_scandir is not None:
+        return _os_scandir(directory)
+    return [_ListDirEntry(directory, e) for e in os.listdir(directory)]
+
+
+def _is_ignored_dir(directory, ignore_dirs):
+    # A module root, e.g. a module named build, is not ignored by its name.
+    if os.path.basename(directory) not in ignore_dirs:
+        return False
+    return not any(os.path.isfile(os.path.join(directory, e)) for e in JAVA_BUILD_FILES)
+
+
+def _walk_java_files_helper(directory, ignore_dirs, in_source_root, layout):
+    try:
+        entries = sorted(_scandir(directory), key=lambda x: x.name)
+    except OSError as e:
+        logging.warning('failed to list directory %s: %s' % (directory, e))
+        return
+    for entry in entries:
+        if entry.is_dir():
+            if 'src/test/java' in entry.path:
+                continue
+            if not in_source_root and entry.name in ignore_dirs and _is_ignored_dir(entry.path, ignore_dirs):
+                continue
+            if layout is not None and not in_source_root and entry.path.endswith('src/main/java'):
+                layout.add_source_dir(entry.path)
+            for sub_entry in _walk_java_files_helper(entry.path, ignore_dirs,
+                                                     in_source_root or 'src/main/java' in entry.path, layout):
+                yield sub_entry
+        elif entry.name.endswith('.java') and entry.is_file():
+            yield entry
+        elif layout is not None and not in_source_root and entry.name in JAVA_BUILD_FILES:
+            # The package directories don't have build files.
+            layout.add_build_file(directory)
+
+
+def walk_java_files(directory, ignore_dirs=None, layout=None):
+    """
+    Walk the directory once and yield the entry of every Java file, whose stat() is cached after the first call.
+    The test sources and the ignored directories are skipped, the ignored directory names only apply outside of
+    src/main/java, where they could also be package names, and not to the module roots which have a build file.
+
+    :param directory: directory to walk
+    :param ignore_dirs: ignored directory names, DEFAULT_IGNORE_DIRS if it's None
+    :param layout: JavaModuleLayout of the directory, which gets the module roots and the source directories found
+        by the walk, so the modules don't need another walk
+    :return: generator of os.DirEntry like objects
+    """
+    if not directory or not os.path.isdir(directory):
+        return iter([])
+    if ignore_dirs is None:
+        ignore_dirs = DEFAULT_IGNORE_DIRS
+    in_source_root = 'src/main/java' in directory
+    if layout is not None and directory.endswith('src/main/java'):
+        layout.add_source_dir(directory)
+    return _walk_java_files_helper(directory, frozenset(ignore_dirs), in_source_root, layout)
+
+
+def get_dir_java_files(directory, ignore_dirs=None):
+    return [e.path for e in walk_java_files(directory, ignore_dirs)]
+
+
+class JavaModule(namedtuple('JavaModule', ['name', 'root', 'source_dirs'])):
+    """
+    Maven or Gradle module, the name is the path of its root relative to the project directory.
+    """
+    __slots__ = ()
+
+
+def _get_module_root(directory, module_roots, directory_roots):
+    # The nearest module root above the directory, the results of the directories on the way are kept.
+    path = []
+    while directory not in module_roots and directory not in directory_roots:
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        path.append(directory)
+        directory = parent
+    root = directory if directory in module_roots else directory_roots[directory]
+    for e in path:
+        directory_roots[e] = root
+    return root
+
+
+class JavaModuleLayout(object):
+    """
+    Module roots and source directories of a project found by walk_java_files, see discover_java_modules.
+    """
+
+    def __init__(self, proj_dir):
+        self.proj_dir = os.path.abspath(proj_dir)
+        self.module_roots = {self.proj_dir}
+        self.source_dirs = []  # Absolute paths of the src/main/java directories
+
+    def add_build_file(self, directory):
+        self.module_roots.add(os.path.abspath(directory))
+
+    def add_source_dir(self, directory):
+        directory = os.path.abspath(directory)
+        self.source_dirs.append(directory)
+        self.module_roots.add(os.path.dirname(os.path.dirname(os.path.dirname(directory))))
+
+    def get_modules(self):
+        """
+        :return: JavaModule list sorted by the roots, the modules without sources are skipped except the root module
+        """
+        module_sources = {self.proj_dir: []}
+        directory_roots = {}
+        for e in self.source_dirs:
+            module_sources.setdefault(_get_module_root(e, self.module_roots, directory_roots), []).append(e)
+        return [JavaModule(os.path.relpath(k, self.proj_dir), k, sorted(v)) for k, v in sorted(module_sources.items())]
+
+
+def discover_java_modules(proj_dir, ignore_dirs=None):
+    """
+    Find the modules of the project by their pom.xml or build.gradle files and their src/main/java directories, the
+    directory of src/main/java is a module even without a build file. The project directory is the root module.
+
+    :param proj_dir: project directory
+    :param ignore_dirs: ignored directory names, DEFAULT_IGNORE_DIRS if it's None
+    :return: JavaModule list sorted by the roots, the modules without sources are skipped except the root module
+    """
+    if not proj_dir or not os.path.isdir(proj_dir):
         return []
-    res = []
-    for f in os.listdir(directory):
-        sub_dir = os.path.join(directory, f)
-        if os.path.isdir(sub_dir) and 'src/test/java' not in sub_dir:
-            sub_res = get_dir_java_files(sub_dir)
-            if sub_res:
-                res += sub_res
-            continue
-        if not _is_valid_java_file(sub_dir):
-            continue
-        res.append(sub_dir)
-    return res
+    layout = JavaModuleLayout(proj_dir)
+    for _ in walk_java_files(proj_dir, ignore_dirs, layout):
+        pass
+    return layout.get_modules()
 
 
 def _get_full_class_name(class_name, class_package_map, package):
@@ -267,63 +648,60 @@ def _get_full_class_name(class_name, class_package_map, package):
         else ('%s.%s' % (package, class_name))
 
 
-def _clear_code_comment(lines):
+def _join_code_lines(lines):
+    return lines[0][0], ''.join(e[1] for e in lines), ''.join(e[2] for e in lines)
+
+
+def _is_multi_statements_line(masked):
+    if masked.count(';') < 2 or '{' in masked or '(' in masked or ')' in masked:
+        return False
+    # Only the first statement belongs to the else without braces.
+    return not ELSE_REGEX.search(masked)
+
+
+def _split_statements(index, text, masked):
     res = []
-    doc_start_pos = (-1, -1)
-    for i, e in enumerate(lines):
-        index = e[0]
-        e = e[1].strip()
-        e = CODE_COMMENT_REGEX.sub('', e)
-        if '/*' in e:
-            doc_start_pos = (i, e.index('/*'))
-            res.append((index, ''.join(e[:doc_start_pos[1]])))
-        if '*/' in e:
-            res.append((index, ''.join(e[e.index('*/') + 2:])))
-            doc_start_pos = (-1, -1)
-            continue
-        if doc_start_pos != (-1, -1):
-            continue
-        res.append((index, e))
-    res = map(lambda x: (x[0], x[1][:x[1].index('//')] if '//' in x[1] else x[1]), res)
+    start = 0
+    while start < len(text):
+        end = masked.find(';', start)
+        if end < 0:
+            end = len(text)
+        statement = ('%s;' % text[start:end]).strip()
+        if statement != ';':
+            masked_start = end - len(text[start:end].lstrip())
+            res.append((index, statement, '%s;' % masked[masked_start:end].strip()))
+        start = end + 1
     return res
 
 
 def _format_code_lines_helper(lines):
+    """
+    :param lines: [(line index, text, masked text)] from lexer.get_code_lines
+    :return: formatted lines in the same layout
+    """
     res = []
     if not lines:
         return res
     left_bracket = 0
-    bracket_s = ''
-    for i, (ide, e) in enumerate(lines):
-        e = e.strip()
-        e_tmp = QUOTE_REGEX.sub(lambda x: x.group()
-                                .replace(';', QUOTE_SEMICOLON_PLACE_HOLDER)
-                                .replace('(', QUOTE_LEFT_BRACKET_PLACE_HOLDER)
-                                .replace(')', QUOTE_RIGHT_BRACKET_PLACE_HOLDER), e)
-        if (_is_import_line(e_tmp) and e_tmp.count(';') > 1 and ';' in e_tmp) or (
-                '{' not in e_tmp and 'if' not in e_tmp and '(' not in e_tmp and ')' not in e_tmp
-                and 'else' not in e_tmp and ';' in e_tmp and e_tmp.count(';') > 1):
-            e_spt = filter(lambda x: x.strip(), e_tmp.split(';'))
-            e_spt = map(lambda x: x + ';', e_spt)
-            e_spt = map(lambda x:
-                        x.replace(QUOTE_SEMICOLON_PLACE_HOLDER, ';')
-                        .replace(QUOTE_LEFT_BRACKET_PLACE_HOLDER, '(')
-                        .replace(QUOTE_RIGHT_BRACKET_PLACE_HOLDER, ')'), e_spt)
-            e_spt = map(str.strip, e_spt)
-            res += map(lambda x: (ide, x), e_spt)
-            i += 1
+    bracket_lines = []
+    for line in lines:
+        masked = line[2]
+        if left_bracket == 0 and ';' in masked and _is_multi_statements_line(masked):
+            res += _split_statements(*line)
             continue
-        left_bracket += e_tmp.count('(')
-        left_bracket -= e_tmp.count(')')
+        left_bracket += masked.count('(')
+        left_bracket -= masked.count(')')
         if left_bracket > 0:
-            bracket_s += e
-        elif left_bracket == 0:
-            if bracket_s:
-                res.append((ide, bracket_s.strip() + e))
-                bracket_s = ''
-            else:
-                res.append((ide, e))
-    lines = filter(lambda x: x[1].strip(), res)
+            bracket_lines.append(line)
+            continue
+        # Join the lines of one statement with the index of its last line, e.g. method params in multiple lines.
+        left_bracket = 0
+        if bracket_lines:
+            bracket_lines.append(line)
+            line = (line[0],) + _join_code_lines(bracket_lines)[1:]
+            bracket_lines = []
+        res.append(line)
+    lines = res
     res = []
     index = 0
     while index < len(lines):
@@ -332,7 +710,7 @@ def _format_code_lines_helper(lines):
             next_line = lines[index + 1]
             if line[1].endswith('[') or line[1].endswith(',') or (
                     next_line[1].startswith('.') and not line[1].endswith(';')):
-                res.append((line[0], line[1] + next_line[1]))
+                res.append(_join_code_lines([line, next_line]))
                 index += 2
                 continue
         res.append(line)
@@ -340,17 +718,21 @@ def _format_code_lines_helper(lines):
     return res
 
 
-def _format_code_lines(lines):
+def _format_code_lines(source, line_index=1, skip_method_bodies=False):
     """
     Clear the code comment and format the code into multiple lines if ; occur more than once in one line.
 
-    :param lines: code lines
-    :return: formatted code lines
+    :param source: Java source text
+    :param line_index: line index of the start of the source
+    :param skip_method_bodies: leave out the bodies of the methods, for the class header and the fields
+    :return: formatted code lines, [(line index, text, masked text)]
     """
-    lines = [(i + 1, e) for i, e in enumerate(lines)]
-    lines = _clear_code_comment(lines)
-    lines = _format_code_lines_helper(lines)
-    return lines
+    tokens = tokenize_java(source, line_index)
+    if skip_method_bodies:
+        tokens = blank_method_bodies(tokens)
+    res = _format_code_lines_helper(get_code_lines(tokens))
+    instrument.count('lines_formatted', len(res))
+    return res
 
 
 def _get_java_class_entity_methods(lines, class_package_map, package, class_name, class_type):
@@ -360,18 +742,16 @@ def _get_java_class_entity_methods(lines, class_package_map, package, class_name
     method = JavaMethodEntity(package=package, class_name=class_name)
     body = []
     left_bracket = 0
-    for idl, line in lines:
-        line = line.strip()
+    for idl, line, masked in lines:
         parsed = _parse_method_line(line, class_package_map, package, class_type)
-        l_tmp = _replace_quote_bracket(line)
         if left_bracket > 0 or parsed:
-            left_bracket += l_tmp.count('{')
-            left_bracket -= l_tmp.count('}')
+            left_bracket += masked.count('{')
+            left_bracket -= masked.count('}')
         if parsed:
-            method.method_types = parsed[0]
-            method.ret_type = parsed[1]
+            method.method_types = _intern_set(parsed[0])
+            method.ret_type = _intern_str(parsed[1])
             method.method_name = parsed[2]
-            method.params = parsed[3]
+            method.params = _intern_map_values(parsed[3])
             method.throws = parsed[4]
             if '{' in line and line[-1] != '{':
                 start = line.index('{') + 1
@@ -386,35 +766,86 @@ def _get_java_class_entity_methods(lines, class_package_map, package, class_name
             res.append(method)
             body = []
             method = JavaMethodEntity(package=package, class_name=class_name)
+    instrument.count('methods_found', len(res))
     return res
 
 
-def _get_java_class_entity(file_name, class_packages):
+def _get_line_offset(source, line_index):
+    offset = 0
+    for _ in range(line_index - 1):
+        offset = source.index('\n', offset) + 1
+    return offset
+
+
+def _find_class_line_index(lines):
+    index = 0
+    while index < len(lines) and not _is_package_line(lines[index][1]):
+        index += 1
+    while index < len(lines) and not _is_class_line(lines[index][1]):
+        index += 1
+    return index
+
+
+def _load_java_class_entity_methods(entity):
+    if not entity.methods_location:
+        return []
+    file_name, offset, line_index, file_size, file_mtime = entity.methods_location
+    try:
+        with open(file_name) as f:
+            file_stat = os.fstat(f.fileno())
+            source = f.read()
+    except IOError as e:
+        logging.error('failed to read the methods of %s from %s: %s' % (entity.name, file_name, e))
+        return []
+    if file_stat.st_size == file_size and file_stat.st_mtime == file_mtime:
+        lines = _format_code_lines(source[offset:], line_index)
+    else:
+        logging.warning('%s is changed after it\'s parsed, the methods may not match the class' % file_name)
+        lines = _format_code_lines(source)
+        lines = lines[_find_class_line_index(lines):]
+    entity.methods_location = None
+    return _get_java_class_entity_methods(lines, entity.class_package_map, entity.package, entity.name,
+                                          entity.class_type)
+
+
+def _get_java_class_entity(file_name, package_index=None, lazy_methods=False):
+    """
+    Parse the Java file.
+
+    :param file_name: Java file path
+    :param package_index: JavaPackageIndex of the project
+    :param lazy_methods: only remember where the class is, its methods are parsed on the first access
+    :return: JavaClassEntity, None if the file has no class
+    """
     if not file_name or not os.path.isfile(file_name):
         return None
+    if package_index is None:
+        package_index = JavaPackageIndex()
     with open(file_name) as f:
-        lines = f.readlines()
-    lines = _format_code_lines(lines)
+        file_stat = os.fstat(f.fileno())
+        source = f.read()
+    # The methods are formatted on the first access in the lazy mode
+    lines = _format_code_lines(source, skip_method_bodies=lazy_methods)
     entity = JavaClassEntity()
 
     index = 0
     # Find package name
-    for _, l in lines:
+    for _, l, _ in lines:
         if _is_package_line(l):
-            entity.package = l.replace('package', '').replace(';', '').strip()
+            entity.package = _intern_str(l.replace('package', '').replace(';', '').strip())
             break
         index += 1
 
     class_package_map = {}
-    for _, l in lines[index:]:
+    wildcard_packages = []
+    for _, l, _ in lines[index:]:
         if _is_import_line(l):
             l = l.replace('import', '').replace(';', '').strip()
             l_spt = l.split('.')
             if l_spt[-1] == '*':
                 base_package = '.'.join(l_spt[:-1])
-                match_packages = filter(lambda x: x.startswith(base_package), class_packages)
-                match_packages_map = {e.split('.')[-1]: '.'.join(e.split('.')[:-1]) for e in match_packages}
-                class_package_map.update(match_packages_map)
+                wildcard_packages.append(base_package)
+                package_index.update_class_package_map(class_package_map, base_package)
             else:
                 class_package_map[l_spt[-1]] = '.'.join(l_spt[:-1])
         if _is_class_line(l):
@@ -426,47 +857,47 @@ def _get_java_class_entity(file_name, class_packages):
 
     # Add local packages import
     if entity.package:
-        match_packages = filter(lambda x: x.startswith(entity.package), class_packages)
-        match_packages_map = {e.split('.')[-1]: '.'.join(e.split('.')[:-1]) for e in match_packages}
-        class_package_map.update(match_packages_map)
-    entity.class_package_map = class_package_map
+        package_index.update_class_package_map(class_package_map, entity.package)
+    entity.class_package_map = _intern_map(class_package_map)
+    entity.wildcard_packages = wildcard_packages
 
     # Find class name, parent class name and its' implemented interfaces.
-    for _, l in lines[index:]:
+    for _, l, _ in lines[index:]:
         if _is_class_line(l):
             # We just ignore the generics here, because it's useless now.
             t = clear_generics(l).replace('{', '').split()
             if 'class' in t:
                 class_index = t.index('class')
                 if class_index != len(t):  # Check index boundary
-                    entity.name = t[class_index + 1]
+                    entity.name = _intern_str(t[class_index + 1])
                     entity.class_type = 0
             elif 'interface' in t:
                 interface_index = t.index('interface')
                 if interface_index != len(t):
-                    entity.name = t[interface_index + 1]
+                    entity.name = _intern_str(t[interface_index + 1])
                     entity.class_type = 1
             elif 'enum' in t:
                 enum_index = t.index('enum')
                 if enum_index != len(t):
-                    entity.name = t[enum_index + 1]
+                    entity.name = _intern_str(t[enum_index + 1])
                     entity.class_type = 2
             if 'extends' in t:
                 extends_index = t.index('extends')
                 if extends_index != len(t):
-                    entity.parent = _get_full_class_name(t[extends_index + 1], class_package_map, entity.package)
+                    entity.parent = _intern_str(_get_full_class_name(t[extends_index + 1], class_package_map,
+                                                                     entity.package))
             if 'implements' in t:
                 imp_index = t.index('implements')
                 imp_name_line = ' '.join(t[imp_index + 1:])
                 imp_names = map(str.strip, imp_name_line.split(','))
                 imp_names = map(lambda x: _get_full_class_name(x, class_package_map, entity.package), imp_names)
-                entity.interfaces = imp_names
+                entity.interfaces = _intern_list(imp_names)
             break
         index += 1
 
     # Find private and public non-static and non-final fields
     entity.fields = {}
-    for _, l in lines[index:]:
+    for _, l, _ in lines[index:]:
         if _is_non_final_static_spring_field_line(l):
             t = l.strip().replace(';', '')
             eq = None
@@ -481,11 +912,16 @@ def _get_java_class_entity(file_name, class_packages):
             t = t.split()
             field_class = '%s.%s' % (class_package_map[t[-2]], t[-2]) if t[-2] in class_package_map else t[-2]
             field_name = t[-1]
-            entity.fields[field_name] = (field_class, eq)
+            entity.fields[field_name] = (_intern_str(field_class), eq)
 
     # Find methods of this class.
-    entity.methods = _get_java_class_entity_methods(lines[index:], class_package_map, entity.package, entity.name,
-                                                    entity.class_type)
+    if lazy_methods and index < len(lines):
+        entity.methods = None
+        entity.methods_location = (file_name, _get_line_offset(source, lines[index][0]), lines[index][0],
+                                   file_stat.st_size, file_stat.st_mtime)
+    else:
+        entity.methods = _get_java_class_entity_methods(lines[index:], class_package_map, entity.package,
+                                                        entity.name, entity.class_type)
 
     # if class has no name, return None
     if not entity.name:
@@ -493,109 +929,572 @@ def _get_java_class_entity(file_name, class_packages):
     return entity
 
 
-def _build_class_dep_chain_helper(entity, class_map, impl_map, visited):
-    if not entity or not entity.name or not class_map:
-        return {}
-    key = build_java_class_key(entity.package, entity.name)
-    if key in visited:
-        return {}
-    visited.add(key)
+def _get_field_class(field):
+    # The generics of a field are traced by their element class, e.g. List<A> -> A.
+    m = GENERICS_REGEX.match(field)
+    return m.group(1) if m else field
+
+
+def _get_class_dependency(entity, key, impl_map, all_impls):
+    # The dependency of an interface is its implementations, the one of a class is its field classes.
     if entity.class_type == 1:
-        if key not in impl_map:
-            visited.remove(key)
+        impls = impl_map.get(key, [])
+        return impls[:] if all_impls else impls[:1]
+    return [_get_field_class(field) for field, _ in entity.fields.values()]
+
+
+class JavaDependencyGraph(object):
+    """
+    Field dependency graph of the start classes, every class is expanded only once and shared by all the classes
+    depending on it. The dependency of an interface is its first implementation, or all the implementations if
+    all_impls is set. The classes rejected by expand_filter are neither expanded nor kept as dependencies.
+    """
+
+    def __init__(self, all_impls=False, expand_filter=None):
+        self.roots = []  # Class keys of the start classes
+        self.adjacency = OrderedDict()  # Expanded class key -> dependency class keys
+        self.interfaces = set()  # Keys of the expanded interfaces
+        self.all_impls = all_impls
+        self.expand_filter = expand_filter  # Predicate of the class keys
+        self._root_keys = set()
+
+    def add_root(self, key, class_map, impl_map):
+        if key not in self._root_keys:
+            self._root_keys.add(key)
+            self.roots.append(key)
+        stack = [key]
+        while stack:
+            key = stack.pop()
+            if key in self.adjacency or key not in class_map:
+                continue
+            entity = class_map[key]
+            instrument.count('dependency_nodes_expanded')
+            if entity.class_type == 1:
+                self.interfaces.add(key)
+            deps = _get_class_dependency(entity, key, impl_map, self.all_impls)
+            if self.expand_filter is not None:
+                deps = [e for e in deps if self.expand_filter(e)]
+            self.adjacency[key] = deps
+            stack.extend(reversed(deps))
+
+    def _to_tree_helper(self, key, visited, depth, max_depth):
+        if key not in self.adjacency or key in visited:
             return {}
-        impl_entity = impl_map[key]
-        res = _build_class_dep_chain_helper(class_map[impl_entity[0]], class_map, impl_map, visited)
+        visited.add(key)
+        if key in self.interfaces:
+            deps = self.adjacency[key]
+            res = self._to_tree_helper(deps[0], visited, depth, max_depth) if deps else {}
+            visited.remove(key)
+            return res
+        dep = {}
+        if max_depth is None or depth < max_depth:
+            for e in self.adjacency[key]:
+                dep[e] = self._to_tree_helper(e, visited, depth + 1, max_depth)
         visited.remove(key)
+        return {key: dep}
+
+    def to_tree(self, key=None, max_depth=None):
+        """
+        Render the dependency tree, the classes already on the path are cut to avoid the cycles.
+
+        :param key: start class key, all the start classes if it's None
+        :param max_depth: count of the field levels to render, no limit if it's None
+        :return: start class key -> {start class key: {field class: {field class: ...}}}
+        """
+        keys = self.roots if key is None else [key]
+        return {e: self._to_tree_helper(e, set(), 0, max_depth) for e in keys}
+
+
+def get_start_class_keys(start_packages, class_map, class_filter=None, file_filter=None):
+    """
+    Get the keys of the classes in the start package directories.
+
+    :param class_filter: predicate of the class keys to keep
+    :param file_filter: predicate of the Java file paths in the start package directories to keep
+    """
+    res = []
+    if not start_packages or not class_map:
         return res
-    dep = {}
-    res = {key: dep}
-    for _, (field, _) in entity.fields.items():
-        m = GENERICS_REGEX.match(field)
-        if m:
-            field = m.group(1)
-        if field in class_map:
-            field_entity = class_map[field]
-            field_dep = _build_class_dep_chain_helper(field_entity, class_map, impl_map, visited)
-            dep[field] = field_dep
-        else:
-            dep[field] = {}
-    visited.remove(key)
+    for start_package in start_packages:
+        if not start_package or not os.path.isdir(start_package):
+            continue
+        for sub_dir in filter(file_filter, get_dir_java_files(start_package)):
+            key = get_java_class_entity_key_by_directory(sub_dir, class_map)
+            if key not in class_map:
+                logging.error('%s not in class_map, dir is: %s' % (key, sub_dir))
+                continue
+            if class_filter is None or class_filter(key):
+                res.append(key)
     return res
 
 
-def _build_class_dep_chain(entity, class_map, impl_map):
-    return _build_class_dep_chain_helper(entity, class_map, impl_map, set())
+def get_dependency_graph(start_packages, class_map, impl_map, all_impls=False, class_filter=None,
+                         expand_filter=None):
+    """
+    Build the field dependency graph of the classes in the start package directories.
 
+    :param all_impls: expand all the implementations of the interfaces, not only the first one
+    :param class_filter: predicate of the start class keys, see get_class_filters
+    :param expand_filter: predicate of the class keys, the other classes are neither expanded nor kept as dependencies
+    """
+    res = JavaDependencyGraph(all_impls, expand_filter)
+    for key in get_start_class_keys(start_packages, class_map, class_filter):
+        res.add_root(key, class_map, impl_map)
+    return res
 
-def _get_dependency_by_package(start_package, class_map, impl_map):
-    if not start_package or not class_map or not os.path.isdir(start_package):
-        return {}
-    res = {}
-    for sub_dir in get_dir_java_files(start_package):
-        key = get_java_class_entity_key_by_directory(sub_dir)
-        if key not in class_map:
-            logging.error('%s not in class_map, dir is: %s' % (key, sub_dir))
-            return None
-        entity = class_map[key]
-        res[key] = _build_class_dep_chain(entity, class_map, impl_map)
+
+def get_proj_dependency_graph(class_map, impl_map, all_impls=False):
+    """
+    Build the field dependency graph of all the project classes.
+    """
+    res = JavaDependencyGraph(all_impls)
+    for key in class_map:
+        res.add_root(key, class_map, impl_map)
     return res
 
 
-def _get_proj_class_packages(proj_dir):
-    if not proj_dir or not os.path.exists(proj_dir) or not os.path.isdir(proj_dir):
-        return []
+def iter_dependency_edges(keys, class_map, impl_map, max_depth=None, max_nodes=None, include=None, exclude=None,
+                          depth_first=False, all_impls=False):
+    """
+    Expand the field dependency of the classes on demand, so the caller can stop at any edge without expanding the
+    rest. Every class is expanded once like JavaDependencyGraph, but with max_depth a class found again by a shorter
+    path in the depth first order is expanded again, so its edges may be yielded twice.
+
+    :param keys: start class keys, e.g. of get_start_class_keys
+    :param max_depth: count of the field levels to expand, no limit if it's None. An interface and its implementation
+        are on the same level like the trees of JavaDependencyGraph.to_tree.
+    :param max_nodes: count of the classes whose dependencies are expanded at most, no limit if it's None. The
+        classes at max_depth are not expanded, so they're not counted.
+    :param include: predicate of the class keys, the edges to the other classes are skipped if it's given
+    :param exclude: predicate of the class keys, the edges to these classes are skipped if it's given
+    :param depth_first: expand depth first instead of breadth first
+    :param all_impls: expand all the implementations of the interfaces, not only the first one
+    :return: generator of (depth, parent class key, child class key), the depth of the children of a start class is 1
+    """
+    pending = deque((0, e) for e in keys)
+    if depth_first:
+        # The stack pops the start classes in their order.
+        pending.reverse()
+    reached = {}  # Class key -> depth it's reached at
+    expanded = set()  # Keys of the classes whose dependencies are expanded
+    while pending:
+        depth, key = pending.pop() if depth_first else pending.popleft()
+        if key not in class_map or key in reached and (max_depth is None or reached[key] <= depth):
+            continue
+        reached[key] = depth
+        entity = class_map[key]
+        child_depth = depth if entity.class_type == 1 else depth + 1
+        if max_depth is not None and child_depth > max_depth:
+            continue
+        if key not in expanded:
+            if max_nodes is not None and len(expanded) >= max_nodes:
+                return
+            expanded.add(key)
+        instrument.count('dependency_nodes_expanded')
+        children = [e for e in _get_class_dependency(entity, key, impl_map, all_impls)
+                    if (include is None or include(e)) and (exclude is None or not exclude(e))]
+        for e in children:
+            yield child_depth, key, e
+        if depth_first:
+            pending.extend((child_depth, e) for e in reversed(children))
+        else:
+            pending.extend((child_depth, e) for e in children)
+
+
+def _match_class_pattern(key, pattern):
+    if any(e in pattern for e in '*?['):
+        return fnmatch.fnmatchcase(key, pattern)
+    return key == pattern or key.startswith(pattern + '.')
+
+
+def get_class_filter(include=None, exclude=None, include_regex=None, exclude_regex=None):
+    """
+    Build the predicate of the class keys, e.g. to skip the classes before they're expanded or analysed.
+
+    :param include: patterns of the classes to keep. A pattern with *, ? or [ is a glob of the class keys, e.g.
+        com.a.*Service, otherwise it's a class or a package with its sub packages, e.g. com.a matches com.a.b.C
+    :param exclude: patterns of the classes to skip
+    :param include_regex: regex searched in the keys of the classes to keep
+    :param exclude_regex: regex searched in the keys of the classes to skip
+    :return: predicate of the class keys, None if there is no filter
+    """
+    if not include and not exclude and not include_regex and not exclude_regex:
+        return None
+    include_regex = re.compile(include_regex) if include_regex else None
+    exclude_regex = re.compile(exclude_regex) if exclude_regex else None
+
+    def class_filter(key):
+        if not key:
+            return False
+        if include and not any(_match_class_pattern(key, e) for e in include):
+            return False
+        if exclude and any(_match_class_pattern(key, e) for e in exclude):
+            return False
+        if include_regex and not include_regex.search(key):
+            return False
+        return not exclude_regex or not exclude_regex.search(key)
+
+    return class_filter
+
+
+def get_class_filters(include=None, exclude=None, include_regex=None, exclude_regex=None):
+    """
+    Build the predicates of get_class_filter for tracing. The included classes are the start classes, but their
+    dependencies out of them are still followed, only the excluded classes are never expanded.
+
+    :return: (predicate of the start classes, predicate of the dependencies to expand), None if there is no filter
+    """
+    return (get_class_filter(include, exclude, include_regex, exclude_regex),
+            get_class_filter(exclude=exclude, exclude_regex=exclude_regex))
+
+
+class JavaReverseDependencyIndex(object):
+    """
+    Classes depending on every project class directly, by the field types and by the interfaces, whose dependencies
+    are their implementations. The index is built once in linear time, a query only visits the dependents found.
+    """
+
+    def __init__(self, class_map, impl_map):
+        self.dependents = {}  # Class key -> keys of the classes depending on it directly
+        for key, entity in class_map.items():
+            if entity.class_type == 1:
+                deps = impl_map.get(key, [])
+            else:
+                deps = {_get_field_class(field) for field, _ in entity.fields.values()}
+            for e in deps:
+                if e != key and e in class_map:
+                    self.dependents.setdefault(e, []).append(key)
+
+    def get_dependents(self, keys, max_depth=None):
+        """
+        Get the classes depending on the classes directly or indirectly, breadth first.
+
+        :param keys: class keys, e.g. of the changed files
+        :param max_depth: count of the dependency levels to follow, no limit if it's None
+        :return: dependent class key -> count of the levels to the nearest of the classes, in the order found
+        """
+        res = OrderedDict()
+        visited = set(keys)
+        level = list(visited)
+        depth = 0
+        while level and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_level = []
+            for key in level:
+                for e in self.dependents.get(key, ()):
+                    if e not in visited:
+                        visited.add(e)
+                        res[e] = depth
+                        next_level.append(e)
+            level = next_level
+        return res
+
+
+def _get_class_packages_by_files(file_names):
     res = []
-    for sub_dir in get_dir_java_files(proj_dir):
+    for sub_dir in file_names:
         if 'src/main/java' not in sub_dir:
             continue
         res.append('.'.join(sub_dir[sub_dir.index('src/main/java') + 14:].replace('.java', '').split(os.sep)))
     return res
 
 
-def get_java_class_entity_key_by_directory(directory):
-    entity = _get_java_class_entity(directory, [])
+def _get_proj_class_packages(proj_dir, ignore_dirs=None):
+    if not proj_dir or not os.path.exists(proj_dir) or not os.path.isdir(proj_dir):
+        return []
+    return _get_class_packages_by_files(get_dir_java_files(proj_dir, ignore_dirs))
+
+
+def get_java_class_entity_key_by_directory(directory, class_map=None):
+    # The files of the project are indexed by get_proj_class_map, so they don't need to be parsed again.
+    if isinstance(class_map, JavaClassMap) and class_map.has_path(directory):
+        return class_map.get_key_by_path(directory)
+    entity = _get_java_class_entity(directory)
     if not entity:
         return None
     return build_java_class_key(entity.package, entity.name)
 
 
-def get_proj_class_map(proj_dir):
-    if not proj_dir or not os.path.exists(proj_dir) or not os.path.isdir(proj_dir):
-        return {}
-    class_packages = _get_proj_class_packages(proj_dir)
+# Parse arguments of the worker processes, which are set once by the pool initializer.
+_worker_package_index = None
+_worker_lazy_methods = False
+
+
+def _init_parse_worker(package_index, lazy_methods, instrumented):
+    global _worker_package_index, _worker_lazy_methods
+    _worker_package_index = package_index
+    _worker_lazy_methods = lazy_methods
+    if instrumented:
+        instrument.enable()
+
+
+def _parse_java_file_worker(file_name):
+    start = time.time()
+    class_entity = _get_java_class_entity(file_name, _worker_package_index, _worker_lazy_methods)
+    # The counters of the worker are sent back with every file.
+    return file_name, class_entity, time.time() - start, instrument.pop_counters()
+
+
+def _parse_java_file_instrumented(file_name, package_index, lazy_methods):
+    start = time.time()
+    res = _get_java_class_entity(file_name, package_index, lazy_methods)
+    instrument.record_file(file_name, time.time() - start)
+    return res
+
+
+def _get_workers_count(workers):
+    if workers is None or workers < 0:
+        return 1
+    return workers or multiprocessing.cpu_count()
+
+
+def _parse_java_files(file_names, package_index, workers, lazy_methods=False):
+    """
+    Parse the Java files, in a process pool if more than one worker is given.
+
+    :return: file name -> JavaClassEntity map
+    """
+    instrument.count('files_parsed', len(file_names))
+    workers = min(_get_workers_count(workers), len(file_names))
+    if workers <= 1:
+        if instrument.is_enabled():
+            return {e: _parse_java_file_instrumented(e, package_index, lazy_methods) for e in file_names}
+        return {e: _get_java_class_entity(e, package_index, lazy_methods) for e in file_names}
     res = {}
-    for sub_dir in get_dir_java_files(proj_dir):
-        class_entity = _get_java_class_entity(sub_dir, class_packages)
-        if not class_entity:
-            continue
-        key = build_java_class_key(class_entity.package, class_entity.name)
-        res[key] = class_entity
+    chunk_size = max(1, min(64, len(file_names) // (workers * 4)))
+    pool = multiprocessing.Pool(workers, _init_parse_worker, (package_index, lazy_methods, instrument.is_enabled()))
+    try:
+        for file_name, class_entity, cost, counters in pool.imap_unordered(_parse_java_file_worker, file_names,
+                                                                           chunk_size):
+            res[file_name] = class_entity
+            instrument.record_file(file_name, cost)
+            instrument.merge_counters(counters)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return res
+
+
+def get_proj_class_map(proj_dir, cache_dir=None, workers=1, ignore_dirs=None, lazy_methods=False):
+    """
+    Parse all the Java files of the project. Every module of discover_java_modules is a shard with its own cache, so
+    the change of one module only parses and saves the files of that module again.
+
+    :param proj_dir: project directory
+    :param cache_dir: directory of the on-disk parse cache, the cache is disabled if it's None
+    :param workers: count of the parse processes, 0 means the count of CPUs
+    :param ignore_dirs: ignored directory names, DEFAULT_IGNORE_DIRS if it's None
+    :param lazy_methods: parse the methods of a class on the first access of JavaClassEntity.methods
+    :return: JavaClassMap of the project
+    """
+    if not proj_dir or not os.path.exists(proj_dir) or not os.path.isdir(proj_dir):
+        return JavaClassMap()
+    layout = JavaModuleLayout(proj_dir)
+    # Walk the project only once, the files feed the modules, the class names and the parser.
+    java_files = list(walk_java_files(proj_dir, ignore_dirs, layout))
+    modules = layout.get_modules()
+    instrument.count('files_walked', len(java_files))
+    file_names = [e.path for e in java_files]
+    # The imports go across the modules, so the package index is shared by all the shards.
+    package_index = JavaPackageIndex(_get_class_packages_by_files(file_names))
+    caches = {}  # Module root -> ClassMapCache
+    file_caches = {}  # File path -> ClassMapCache of its module
+    if cache_dir:
+        module_roots = {e.root for e in modules}
+        directory_roots = {}
+        for java_file in java_files:
+            root = _get_module_root(os.path.dirname(os.path.abspath(java_file.path)), module_roots, directory_roots)
+            if root not in caches:
+                caches[root] = ClassMapCache(ClassMapCache.get_cache_file(cache_dir, root), JAVA_PARSER_VERSION)
+                caches[root].load()
+                caches[root].bind_package_index(package_index)
+            file_caches[java_file.path] = caches[root]
+    parsed = {}
+    file_stats = {}
+    for java_file in java_files:
+        if java_file.path in file_caches:
+            file_stats[java_file.path] = java_file.stat()
+            hit, class_entity = file_caches[java_file.path].get(java_file.path, file_stats[java_file.path])
+            if hit:
+                parsed[java_file.path] = class_entity
+    # The missed files of all the shards are parsed by one pool, so the shards are parsed in parallel.
+    new_parsed = _parse_java_files([e for e in file_names if e not in parsed], package_index, workers, lazy_methods)
+    for sub_dir, class_entity in new_parsed.items():
+        if sub_dir in file_caches:
+            file_caches[sub_dir].put(sub_dir, class_entity, file_stats[sub_dir])
+    parsed.update(new_parsed)
+
+    # Merge by the order of the files, so the result doesn't depend on the order of the parsing.
+    res = JavaClassMap()
+    res.package_index = package_index
+    res.modules = modules
+    for sub_dir in file_names:
+        res.add(sub_dir, parsed[sub_dir])
+    for root, cache in sorted(caches.items()):
+        # Only the caches of the changed modules are written.
+        cache.save()
+        logging.info('class map cache of %s: %d hits, %d misses' % (root, cache.hits, cache.misses))
     return res
 
 
+def _is_walked_java_file(file_name, proj_dir, ignore_dirs):
+    # Same as the files yielded by walk_java_files(proj_dir, ignore_dirs).
+    if not file_name.endswith('.java') or 'src/test/java' in file_name:
+        return False
+    rel_path = os.path.relpath(file_name, proj_dir)
+    if rel_path.startswith(os.pardir):
+        return False
+    directory = proj_dir
+    in_source_root = 'src/main/java' in directory
+    for name in rel_path.split(os.sep)[:-1]:
+        directory = os.path.join(directory, name)
+        if not in_source_root and _is_ignored_dir(directory, ignore_dirs):
+            return False
+        in_source_root = in_source_root or 'src/main/java' in directory
+    return True
+
+
+def update_proj_class_map(class_map, proj_dir, added=(), modified=(), deleted=(), impl_map=None,
+                          setup_method_dep=False, workers=1, ignore_dirs=None, lazy_methods=False):
+    """
+    Update the class map of get_proj_class_map in place by the changed files, e.g. the ones of
+    git_helper.diff_changed_files. Besides the changed files, only the files importing the packages which got new or
+    deleted classes are parsed again.
+
+    :param class_map: JavaClassMap of get_proj_class_map
+    :param proj_dir: project directory
+    :param added: added Java file paths, absolute or relative to the project directory
+    :param modified: modified Java file paths
+    :param deleted: deleted Java file paths
+    :param impl_map: result of get_impl_map, which is updated in place if it's given
+    :param setup_method_dep: set up the method dependencies of the parsed classes like setup_class_map_method_dep
+    :param workers: count of the parse processes, 0 means the count of CPUs
+    :param ignore_dirs: ignored directory names, DEFAULT_IGNORE_DIRS if it's None
+    :param lazy_methods: parse the methods of a class on the first access of JavaClassEntity.methods
+    :return: keys of the added, changed and removed classes
+    """
+    if class_map is None or not proj_dir or not os.path.isdir(proj_dir):
+        return set()
+    if ignore_dirs is None:
+        ignore_dirs = DEFAULT_IGNORE_DIRS
+    ignore_dirs = frozenset(ignore_dirs)
+    proj_dir = os.path.abspath(proj_dir)
+    if class_map.package_index is None:
+        class_map.package_index = JavaPackageIndex(_get_class_packages_by_files(class_map.path_key_map.keys()))
+    package_index = class_map.package_index
+
+    def get_abs_paths(file_names):
+        return {os.path.abspath(os.path.join(proj_dir, e)) for e in file_names or ()}
+
+    deleted = {e for e in get_abs_paths(deleted) if not os.path.isfile(e)}
+    changed = {e for e in get_abs_paths(added) | get_abs_paths(modified)
+               if os.path.isfile(e) and _is_walked_java_file(e, proj_dir, ignore_dirs)}
+    # The classes are indexed by their paths, so only the new and the deleted files change the package index.
+    new_classes = set(_get_class_packages_by_files([e for e in changed if not class_map.has_path(e)]))
+    deleted_classes = set(_get_class_packages_by_files([e for e in deleted if class_map.has_path(e)]))
+    for e in new_classes:
+        package_index.add(e)
+    for e in deleted_classes - new_classes:
+        package_index.remove(e)
+    changed_packages = {e.rpartition('.')[0] for e in new_classes ^ deleted_classes}
+    if changed_packages:
+        # The imported classes of these files are changed.
+        for key, file_name in class_map.key_path_map.items():
+            entity = class_map[key]
+            if entity.package in changed_packages or changed_packages.intersection(entity.wildcard_packages):
+                changed.add(file_name)
+    changed -= deleted
+
+    old_entities = {}
+    for file_name in deleted | changed:
+        key = class_map.get_key_by_path(file_name)
+        if key in class_map and class_map.get_path_by_key(key) == file_name:
+            old_entities[key] = class_map[key]
+        if file_name in deleted:
+            class_map.remove(file_name)
+    new_keys = set()
+    for file_name, entity in _parse_java_files(sorted(changed), package_index, workers, lazy_methods).items():
+        # A class keeping its key is replaced in place, so the order of the classes is the one of a full parse.
+        if class_map.get_key_by_path(file_name) != (build_java_class_key(entity.package, entity.name)
+                                                   if entity else None):
+            class_map.remove(file_name)
+        key = class_map.add(file_name, entity)
+        if key:
+            new_keys.add(key)
+            if setup_method_dep:
+                _setup_entity_method_dep(entity)
+    if impl_map is not None:
+        update_impl_map(impl_map, class_map, old_entities, new_keys)
+    return set(old_entities.keys()) | new_keys
+
+
+class _StatementSpans(object):
+    """
+    Tokens of one statement from a single left to right scan, with the bracket depths of the separators, so the
+    invoked method params are counted without scanning the rest of the statement for every token.
+    """
+
+    def __init__(self, line):
+        self.tokens = []  # Tokens which don't start with '.', e.g. the method of "a().b()" is in the separators
+        token_spans = []
+        for m in STATEMENT_TOKEN_REGEX.finditer(line):
+            if m.group()[0] != '.':
+                self.tokens.append(m.group())
+                token_spans.append(m.span())
+        # Text after every token to the next token or the line end.
+        self.separated = [line[e[1]:token_spans[i + 1][0] if i < len(token_spans) - 1 else len(line)]
+                          for i, e in enumerate(token_spans)]
+        # Bracket depth after every separator, counting from 0 before the first one.
+        self._depths = []
+        self._depth_commas = {}  # Bracket depth -> indices of the separators with ',' at the depth
+        depth = 0
+        for i, e in enumerate(self.separated):
+            depth += e.count('(') - e.count(')') + e.count('{') - e.count('}')
+            self._depths.append(depth)
+            if ',' in e:
+                self._depth_commas.setdefault(depth, []).append(i)
+        # Index of the separator closing the brackets after every token, None if they are not closed
+        self._close_ends = [None] * len(self.separated)
+        depth_closes = {}  # Bracket depth -> index of the nearest separator with ')' at the depth
+        for i in range(len(self.separated) - 1, -1, -1):
+            self._close_ends[i] = depth_closes.get(self._depths[i] - 1)
+            if ')' in self.separated[i]:
+                depth_closes[self._depths[i]] = i
+
+    def get_param_count(self, index):
+        """
+        Count the params of the brackets after the token, 0 if the brackets are not closed.
+        """
+        # The brackets are closed by the first separator after the token which gets one less depth with ')'.
+        end = self._close_ends[index]
+        if end is None:
+            return 0
+        commas = self._depth_commas.get(self._depths[index], [])
+        return bisect.bisect_left(commas, end) - bisect.bisect_right(commas, index) + 1
+
+
 def _find_vars_and_methods(line, line_index, entity):
     if not line:
         return {}
 
     raw_line = line
     line = clear_generics(_clear_quotes(line)).replace('this.', '')
-    for e in '.+-*/,^!&|<>%':
-        line = e.join(map(str.strip, line.split(e)))
-    line_spt = filter(lambda x: x, re.split(METHOD_LINE_SPLIT_REGEX, line))
-    line_spt = [e + line_spt[i + 1] if e.startswith('.') and i < len(line_spt) - 1
-                else e for i, e in enumerate(line_spt)]
-    line_spt = filter(lambda x: not x.startswith('.'), line_spt)
+    line = OPERATOR_SPACE_REGEX.sub(r'\1', line).strip()
+    spans = _StatementSpans(line)
+    line_spt = spans.tokens
     if not line_spt:
         return {}
 
     res = {}
-    for spt in line_spt:
-        line = line.replace(spt, '^^^', 1)
-    separated = line.split('^^^')[1:]
+    separated = spans.separated
     var_method_name_map = {'.'.join(e.split('.')[:-1]): e.split('.')[-1] for e in line_spt
                            if '.' in e and _is_method_name(e.split('.')[-1])}
     line_spt = map(lambda x: '.'.join(x.split('.')[:-1] if '.' in x else [x]), line_spt)
+    # The tokens are shared by all the variables of this line.
+    line_tokens = None
     for i in range(len(separated)):
         if i < len(separated) - 1 and not separated[i].strip() and _is_declare_type(line_spt[i]) \
                 and _is_declare_var(line_spt[i + 1]):
@@ -606,47 +1505,19 @@ def _find_vars_and_methods(line, line_index, entity):
             res[line_spt[i]] = {
                 'class_type': '?',
             }
-            left_bracket = 1
-            end = None
-            for j, x in enumerate(separated[i + 1:]):
-                left_bracket += x.count('(')
-                left_bracket -= x.count(')')
-                left_bracket += x.count('{')
-                left_bracket -= x.count('}')
-                if ')' in x and left_bracket == 0:
-                    end = j
-                    break
-            param_count = 0
-            if end is not None:
-                left_bracket = 0
-                for e in separated[i + 1: end + i + 1]:
-                    left_bracket += e.count('(')
-                    left_bracket -= e.count(')')
-                    left_bracket += e.count('{')
-                    left_bracket -= e.count('}')
-                    if ',' in e and left_bracket == 0:
-                        param_count += 1
-                param_count += 1
-
+            param_count = spans.get_param_count(i)
             if line_spt[i] in var_method_name_map:
                 method_name = var_method_name_map[line_spt[i]]
                 res[line_spt[i]]['invoke_methods'] = {(method_name, param_count)}
             else:
-                entity_method_keys = {(e.method_name, len(e.params)) for e in entity.methods}
                 var_key = (line_spt[i], param_count)
-                if var_key in entity_method_keys:
+                if var_key in entity.method_index.key_method_map:
                     res[line_spt[i]]['class_type'] = 'Self'
                     res[line_spt[i]]['self_method'] = {var_key}
         if _is_declare_var(line_spt[i]) and line_spt[i] in res:
-            res[line_spt[i]]['line_info'] = [
-                {
-                    'line_spt': line_spt,
-                    'separated': separated,
-                    'raw_line': raw_line,
-                    'line_index': line_index,
-                    'var_index': i
-                }
-            ]
+            if line_tokens is None:
+                line_tokens = JavaLineTokens(raw_line, tuple(line_spt), tuple(separated))
+            res[line_spt[i]]['line_info'] = [JavaLineInfo(line_index, i, line_tokens)]
     return res
 
 
@@ -666,6 +1537,9 @@ def _setup_entity_method_dep_by_method(entity, method):
                 external_vars[k]['line_info'] += v['line_info']
             elif k in local_vars:
                 local_vars[k]['line_info'] += v['line_info']
+                if var_invoke_methods:
+                    # The methods invoked on the later lines of a param or a local variable.
+                    local_vars[k].setdefault('invoke_methods', set()).update(var_invoke_methods)
 
             if var_class_type == '?' and k in method.params:
                 var_class_type = method.params[k]
@@ -690,6 +1564,7 @@ def _setup_entity_method_dep_by_method(entity, method):
     method.method_body['local_vars'] = local_vars
     method.method_body['external_vars'] = external_vars
     method.method_body['self_methods'] = self_methods
+    instrument.count('variables_resolved', len(local_vars) + len(external_vars))
 
 
 def _setup_entity_method_dep(entity):
@@ -699,11 +1574,24 @@ def _setup_entity_method_dep(entity):
         _setup_entity_method_dep_by_method(entity, method)
 
 
-def setup_class_map_method_dep(class_map):
+def setup_class_map_method_dep(class_map, keys=None):
+    """
+    Set up the method dependencies of the classes.
+
+    :param keys: keys of the classes to set up, e.g. the ones affecting the output, all the classes if it's None
+    """
     if not class_map:
         return
-    for v in class_map.values():
-        _setup_entity_method_dep(v)
+    for k in class_map if keys is None else keys:
+        if k in class_map:
+            _setup_entity_method_dep(class_map[k])
+
+
+def _sort_impls(impls, class_map):
+    # The implementations are in the walk order of their files instead of the order of the class map dict, which
+    # depends on how the classes were added, so a full parse and an incremental update have the same first one.
+    if isinstance(class_map, JavaClassMap):
+        impls.sort(key=lambda x: (class_map.get_path_by_key(x) or '').split(os.sep))
 
 
 def get_impl_map(class_map):
@@ -714,13 +1602,49 @@ def get_impl_map(class_map):
         for e in v.interfaces:
             if e in impl_map:
                 impl_map[e] += [k]
-    return {k: v for k, v in impl_map.items() if v}
+    impl_map = {k: v for k, v in impl_map.items() if v}
+    for v in impl_map.values():
+        _sort_impls(v, class_map)
+    return impl_map
+
+
+def update_impl_map(impl_map, class_map, old_entities, new_keys):
+    """
+    Update the result of get_impl_map in place after the classes of class_map are changed.
+
+    :param impl_map: result of get_impl_map
+    :param class_map: updated class map
+    :param old_entities: class key -> entity before the change, of the changed and the removed classes
+    :param new_keys: keys of the added and the changed classes
+    """
+    # The first implementation is the dependency of an interface, so the changed lists are built again and sorted
+    # like get_impl_map instead of appending the changed classes.
+    changed = {k for k in old_entities if k not in class_map}
+    changed.update(k for k in new_keys if k not in old_entities)  # The classes implementing a new interface
+    for v in old_entities.values():
+        changed.update(v.interfaces)
+    for k in new_keys:
+        changed.update(class_map[k].interfaces)
+    for e in changed:
+        impl_map.pop(e, None)
+    changed.intersection_update(class_map)
+    if not changed:
+        return
+    for k, v in class_map.items():
+        for e in v.interfaces:
+            if e in changed:
+                impl_map.setdefault(e, []).append(k)
+    for e in changed:
+        if e in impl_map:
+            _sort_impls(impl_map[e], class_map)
 
 
-def get_dependency(start_packages, class_map, impl_map):
+def get_dependency(start_packages, class_map, impl_map, max_depth=None):
+    """
+    Get the field dependency trees of the classes in the start package directories.
+
+    :param max_depth: count of the field levels in the trees, no limit if it's None
+    """
     if not start_packages or not class_map:
         return {}
-    res = {}
-    for e in start_packages:
-        res.update(_get_dependency_by_package(e, class_map, impl_map))
-    return res
+    return get_dependency_graph(start_packages, class_map, impl_map).to_tree(max_depth=max_depth)
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+
+from arch_rules import get_reachability_index
+from call_graph import get_call_graph
+from cli_helper import *
+from core import *
+from daemon_client import DEFAULT_DAEMON_ADDRESS, parse_address
+from impact import get_impact_by_reverse_index
+from reachability import check_rules
+from tracer import DEFAULT_TREE_OUTPUT, trace_by_class_map
+from ut_gen import ut_gen_by_class_map
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+DEFAULT_POLL_INTERVAL = 2.0
+
+
+class AnalysisState(object):
+    """
+    Parsed project kept in memory, which is updated by the changed files instead of parsing the project again.
+    """
+
+    def __init__(self, proj_dir, cache_dir=None, workers=1, ignore_dirs=None):
+        self.proj_dir = os.path.abspath(proj_dir)
+        self.workers = workers
+        self.ignore_dirs = ignore_dirs
+        self.lock = threading.RLock()  # Held by every request and update
+        self._file_stats = self._get_file_stats()
+        # The NPE check and the UT generation need the methods and their dependencies.
+        self.class_map = get_proj_class_map(self.proj_dir, cache_dir, workers, ignore_dirs)
+        setup_class_map_method_dep(self.class_map)
+        self.impl_map = get_impl_map(self.class_map)
+        self._reverse_index = None
+        self._call_graph = None
+        self._reachability_index = None
+
+    def _get_file_stats(self):
+        res = {}
+        for e in walk_java_files(self.proj_dir, self.ignore_dirs):
+            stat = e.stat()
+            res[e.path] = (stat.st_mtime, stat.st_size)
+        return res
+
+    @property
+    def reverse_index(self):
+        # Built on the first impact query after a change.
+        if self._reverse_index is None:
+            self._reverse_index = JavaReverseDependencyIndex(self.class_map, self.impl_map)
+        return self._reverse_index
+
+    @property
+    def call_graph(self):
+        # Built on the first call query after a change.
+        if self._call_graph is None:
+            self._call_graph = get_call_graph(self.class_map, self.impl_map)
+        return self._call_graph
+
+    @property
+    def reachability_index(self):
+        # Built on the first rule check after a change.
+        if self._reachability_index is None:
+            self._reachability_index = get_reachability_index(self.class_map, self.impl_map)
+        return self._reachability_index
+
+    def _update(self, added, modified, deleted):
+        if not added and not modified and not deleted:
+            return []
+        changed = update_proj_class_map(self.class_map, self.proj_dir, added, modified, deleted, self.impl_map,
+                                        setup_method_dep=True, workers=self.workers, ignore_dirs=self.ignore_dirs)
+        self._reverse_index = None
+        self._call_graph = None
+        self._reachability_index = None
+        logging.info('%d classes of %s are updated' % (len(changed), self.proj_dir))
+        return sorted(changed)
+
+    def refresh(self):
+        """
+        Update the parsed project by the files changed since the last refresh, which are found by their modification
+        times and sizes.
+
+        :return: keys of the added, changed and removed classes
+        """
+        # The project is walked without the lock, so the requests are not blocked by it.
+        file_stats = self._get_file_stats()
+        with self.lock:
+            added = [e for e in file_stats if e not in self._file_stats]
+            modified = [e for e, v in file_stats.items() if e in self._file_stats and self._file_stats[e] != v]
+            deleted = [e for e in self._file_stats if e not in file_stats]
+            self._file_stats = file_stats
+            return self._update(added, modified, deleted)
+
+    def update(self, added=(), modified=(), deleted=()):
+        """
+        Update the parsed project by the changed files at once, e.g. the files saved by an IDE.
+
+        :return: keys of the added, changed and removed classes
+        """
+        with self.lock:
+            for file_name in list(added or ()) + list(modified or ()) + list(deleted or ()):
+                file_name = os.path.abspath(os.path.join(self.proj_dir, file_name))
+                if os.path.isfile(file_name):
+                    stat = os.stat(file_name)
+                    self._file_stats[file_name] = (stat.st_mtime, stat.st_size)
+                else:
+                    self._file_stats.pop(file_name, None)
+            return self._update(added, modified, deleted)
+
+
+def _get_proj_path(state, path):
+    """
+    Resolve a file of the request against the project directory, the clients may not read or write the files out of
+    the project.
+    """
+    if not path:
+        return path
+    if not isinstance(path, str):
+        # The JSON strings are unicode on Python 2, which can't be joined with a non-ASCII project path.
+        path = path.encode('utf-8')
+    res = os.path.abspath(os.path.join(state.proj_dir, path))
+    proj_dir = os.path.realpath(state.proj_dir)
+    real_path = os.path.realpath(res)
+    if real_path != proj_dir and not real_path.startswith(proj_dir + os.sep):
+        raise ValueError('%s is out of the project %s' % (path, state.proj_dir))
+    return res
+
+
+def _handle_ping(state, params):
+    return {'proj_dir': state.proj_dir, 'classes': len(state.class_map)}
+
+
+def _handle_update(state, params):
+    if params.get('since'):
+        # GitPython is only needed by the update from a commit.
+        from git_helper import diff_changed_files
+        # The repository may have the files out of the project.
+        return state.update(*[[e for e in files if e.startswith(state.proj_dir + os.sep)]
+                              for files in diff_changed_files(params['since'], state.proj_dir)])
+    return state.update(*[[_get_proj_path(state, e) for e in params.get(name) or ()]
+                          for name in ('added', 'modified', 'deleted')])
+
+
+def _pop_start_packages(state, params):
+    return [_get_proj_path(state, e) for e in params.pop('start_packages', None) or ()]
+
+
+def _pop_class_filters(params):
+    # include, exclude, include_regex and exclude_regex of core.get_class_filters.
+    return get_class_filters(*[params.pop(e, None) for e in ('include', 'exclude', 'include_regex', 'exclude_regex')])
+
+
+def _handle_dependency(state, params):
+    class_filter, expand_filter = _pop_class_filters(params)
+    graph = get_dependency_graph(_pop_start_packages(state, params), state.class_map, state.impl_map,
+                                 class_filter=class_filter, expand_filter=expand_filter)
+    return graph.to_tree(params.get('key'), params.get('max_depth'))
+
+
+def _handle_expand(state, params):
+    class_filter, expand_filter = _pop_class_filters(params)
+    keys = get_start_class_keys(_pop_start_packages(state, params), state.class_map, class_filter)
+    edges = iter_dependency_edges(keys, state.class_map, state.impl_map, params.get('max_depth'),
+                                  params.get('max_nodes'), expand_filter, None, params.get('depth_first', False))
+    return list(edges)
+
+
+def _handle_trace(state, params):
+    start_packages = _pop_start_packages(state, params)
+    class_filter, expand_filter = _pop_class_filters(params)
+    params['output_file'] = _get_proj_path(state, params.get('output_file', DEFAULT_TREE_OUTPUT))
+    for name in ('export_file', 'rank_file', 'cycles_file'):
+        params[name] = _get_proj_path(state, params.get(name))
+    trace_by_class_map(start_packages, state.class_map, state.impl_map, class_filter,
+                       expand_filter=expand_filter, **params)
+    return {}
+
+
+def _handle_impact(state, params):
+    return get_impact_by_reverse_index(params.get('classes') or [], state.class_map, state.reverse_index,
+                                       params.get('max_depth'))
+
+
+def _handle_check_rules(state, params):
+    return check_rules(state.reachability_index, [tuple(e) for e in params.get('rules') or []],
+                       params.get('max_sources'))
+
+
+def _get_method_node(params):
+    return params.get('class'), params.get('method'), params.get('param_count')
+
+
+def _handle_callers(state, params):
+    return state.call_graph.get_callers(_get_method_node(params), params.get('max_depth', 1))
+
+
+def _handle_callees(state, params):
+    return state.call_graph.get_callees(_get_method_node(params), params.get('max_depth', 1))
+
+
+def _handle_npe(state, params):
+    # GitPython is only needed by the NPE check.
+    from git_helper import diff_against_master
+    from npe_checker import process_null_pointer
+    return process_null_pointer(state.class_map, diff_against_master(params.get('branch_name'), state.proj_dir))
+
+
+def _handle_ut_gen(state, params):
+    ut_gen_by_class_map(_pop_start_packages(state, params), state.class_map, state.impl_map,
+                        _get_proj_path(state, params.get('target_dir')), class_filter=_pop_class_filters(params)[0])
+    return {}
+
+
+COMMANDS = {
+    'ping': _handle_ping,
+    'update': _handle_update,
+    'dependency': _handle_dependency,
+    'expand': _handle_expand,
+    'trace': _handle_trace,
+    'impact': _handle_impact,
+    'check_rules': _handle_check_rules,
+    'callers': _handle_callers,
+    'callees': _handle_callees,
+    'npe': _handle_npe,
+    'ut_gen': _handle_ut_gen,
+}
+
+
+def handle_request(state, request):
+    """
+    :param state: AnalysisState of the daemon
+    :param request: {command, params}, see daemon_client.request
+    :return: response of the request
+    """
+    if not isinstance(request, dict) or not isinstance(request.get('params') or {}, dict):
+        return {'ok': False, 'error': 'bad request'}
+    command = request.get('command')
+    params = dict(request.get('params') or {})
+    proj_dir = params.pop('proj_dir', None)
+    if command not in COMMANDS:
+        return {'ok': False, 'error': 'unknown command: %s' % command}
+    if proj_dir and os.path.abspath(proj_dir) != state.proj_dir:
+        return {'ok': False, 'error': 'daemon of %s doesn\'t serve %s' % (state.proj_dir, proj_dir)}
+    try:
+        with state.lock:
+            return {'ok': True, 'result': COMMANDS[command](state, params)}
+    except Exception as e:
+        logging.exception('request %s failed' % command)
+        return {'ok': False, 'error': '%s: %s' % (type(e).__name__, e)}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # One request per line, the connection may be kept for several requests.
+        for line in iter(self.rfile.readline, b''):
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line.decode('utf-8'))
+            except ValueError as e:
+                response = {'ok': False, 'error': 'bad request: %s' % e}
+            else:
+                if isinstance(request, dict) and request.get('command') == 'shutdown':
+                    response = {'ok': True, 'result': {}}
+                    threading.Thread(target=self.server.shutdown).start()
+                else:
+                    response = handle_request(self.server.state, request)
+            self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _poll(state, interval, stopped):
+    while not stopped.wait(interval):
+        try:
+            state.refresh()
+        except Exception:
+            logging.exception('refresh of %s failed' % state.proj_dir)
+
+
+def _is_loopback_host(host):
+    try:
+        addresses = {e[4][0] for e in socket.getaddrinfo(host, None)}
+    except socket.error:
+        return False
+    return all(e.startswith('127.') or e == '::1' for e in addresses)
+
+
+def check_address(address, allow_remote=False):
+    """
+    :return: whether the daemon may listen on the address, a host:port needs to be a loopback address without
+        allow_remote
+    """
+    address = parse_address(address)
+    if isinstance(address, tuple) and not allow_remote and not _is_loopback_host(address[0]):
+        logging.error('%s:%d is not a loopback address, the daemon needs --allow-remote to listen on it' % address)
+        return False
+    return True
+
+
+def serve(state, address=DEFAULT_DAEMON_ADDRESS, poll_interval=DEFAULT_POLL_INTERVAL, allow_remote=False):
+    """
+    Serve the requests of daemon_client.request until the shutdown command.
+
+    :param state: AnalysisState of the project
+    :param address: Unix socket path or host:port, see daemon_client.parse_address
+    :param poll_interval: seconds between the checks of the changed files, they're not checked if it's not positive
+    :param allow_remote: listen on a host:port which is not a loopback address. There is no authentication, so
+        anyone reaching it can read the project and write the files in it.
+    """
+    if not check_address(address, allow_remote):
+        return
+    address = parse_address(address)
+    if isinstance(address, tuple):
+        server = _TCPServer(address, _RequestHandler)
+    else:
+        if os.path.exists(address):
+            # Left by a daemon which was killed.
+            os.remove(address)
+        if os.path.dirname(address) and not os.path.isdir(os.path.dirname(address)):
+            os.makedirs(os.path.dirname(address))
+        server = _UnixServer(address, _RequestHandler)
+    server.state = state
+    stopped = threading.Event()
+    poller = None
+    if poll_interval and poll_interval > 0:
+        poller = threading.Thread(target=_poll, args=(state, poll_interval, stopped))
+        poller.daemon = True
+        poller.start()
+    logging.info('daemon of %s is listening on %s' % (state.proj_dir, address))
+    try:
+        server.serve_forever()
+    finally:
+        stopped.set()
+        if poller is not None:
+            poller.join()
+        server.server_close()
+        if not isinstance(address, tuple) and os.path.exists(address):
+            os.remove(address)
+
+
+def main():
+    parser = build_arg_parser('Keep the parsed Java project in memory and serve the requests of the command line '
+                              'tools with --daemon.')
+    parser.add_argument('proj_dir', help='analyse project directory')
+    parser.add_argument('--address', default=DEFAULT_DAEMON_ADDRESS,
+                        help='Unix socket path or host:port to listen on (default: %(default)s)')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='seconds between the checks of the changed files, 0 disables them (default: '
+                             '%(default)s)')
+    parser.add_argument('--allow-remote', action='store_true',
+                        help='listen on a host:port which is not a loopback address, anyone reaching it can read the '
+                             'project and write the files in it')
+    args = parser.parse_args()
+    setup_logging(args)
+    if not args.proj_dir or not os.path.isdir(args.proj_dir):
+        logging.error('project dir is not a directory: %s' % args.proj_dir)
+        sys.exit(-1)
+    if not check_address(args.address, args.allow_remote):
+        sys.exit(-1)
+    options = get_class_map_options(args)
+    state = AnalysisState(args.proj_dir, options['cache_dir'], options['workers'], options['ignore_dirs'])
+    serve(state, args.address, args.poll_interval, args.allow_remote)
+
+
+if __name__ == '__main__':
+    main()
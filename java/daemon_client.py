@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import socket
+
+DEFAULT_DAEMON_ADDRESS = os.path.join(os.path.expanduser('~'), '.deepcode', 'daemon.sock')
+
+
+def parse_address(address):
+    """
+    :param address: Unix socket path or host:port, e.g. localhost:7700
+    :return: (host, port) of a TCP address, or the Unix socket path
+    """
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and os.sep not in host:
+        return host or 'localhost', int(port)
+    return address
+
+
+def connect(address):
+    address = parse_address(address)
+    if isinstance(address, tuple):
+        return socket.create_connection(address)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(address)
+    return sock
+
+
+def request(address, command, **params):
+    """
+    Send one request to the daemon of daemon.py, the request and the response are JSON objects of one line:
+    {"command": command, "params": params} -> {"ok": true, "result": result} or {"ok": false, "error": message}.
+
+    :param address: address of the daemon, see parse_address
+    :return: result of the command, None if it failed
+    """
+    try:
+        sock = connect(address)
+    except socket.error as e:
+        logging.error('cannot connect to the daemon %s: %s' % (address, e))
+        return None
+    try:
+        sock.sendall((json.dumps({'command': command, 'params': params}) + '\n').encode('utf-8'))
+        line = sock.makefile('rb').readline()
+    except socket.error as e:
+        logging.error('request %s to the daemon %s failed: %s' % (command, address, e))
+        return None
+    finally:
+        sock.close()
+    if not line:
+        logging.error('daemon %s closed the connection of request %s' % (address, command))
+        return None
+    response = json.loads(line.decode('utf-8'))
+    if not response.get('ok'):
+        logging.error('request %s to the daemon %s failed: %s' % (command, address, response.get('error')))
+        return None
+    return response.get('result')
@@ -1,3 +1,5 @@
+import os
+
 from git import Repo
 
 
@@ -56,3 +58,31 @@ def diff_against_master(branch_name, proj_dir):
     if not diff:
         return {}
     return _process_diff_lines(diff.split('\n'))
+
+
+def _process_name_status_lines(lines):
+    added, modified, deleted = [], [], []
+    status_files = {'A': added, 'M': modified, 'D': deleted}
+    for l in lines:
+        l_spt = l.split('\t')
+        if len(l_spt) < 2 or l_spt[0][:1] not in status_files:
+            continue
+        status_files[l_spt[0][:1]].append(l_spt[-1])
+    return added, modified, deleted
+
+
+def diff_changed_files(commit, proj_dir):
+    """
+    Get the files changed since the commit, including the uncommitted changes and the untracked files, e.g. for
+    core.update_proj_class_map.
+
+    :return: (added, modified, deleted) absolute file paths
+    """
+    if not commit or not proj_dir:
+        return [], [], []
+    repo = Repo(proj_dir)
+    # Renames are reported as a deleted file and an added one.
+    diff = repo.git.diff('--name-status', '--no-renames', commit).encode('utf-8')
+    added, modified, deleted = _process_name_status_lines(diff.split('\n')) if diff else ([], [], [])
+    added += [e for e in repo.untracked_files if e not in added]
+    return tuple([os.path.join(repo.working_tree_dir, e) for e in files] for files in (added, modified, deleted))
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import csv
+import gzip
+import json
+import logging
+import os
+
+from xml.sax.saxutils import escape, quoteattr
+
+from graph_matrix import JavaGraphMatrix, has_numpy
+
+NODE_TYPE_CLASS = 'class'  # Expanded project class
+NODE_TYPE_INTERFACE = 'interface'  # Expanded project interface, its dependency is the implementation
+NODE_TYPE_EXTERNAL = 'external'  # Class out of the project, e.g. String, which is never expanded
+
+
+def _open_output(file_name, compress):
+    if compress:
+        return gzip.open(file_name, 'wb')
+    return open(file_name, 'wb')
+
+
+def _iter_nodes(graph):
+    """
+    Yield (class key, node type, dependency class keys) of every node once, the edges of a node are only kept
+    while it's written.
+    """
+    seen = set()
+    for key, deps in graph.adjacency.items():
+        seen.add(key)
+        yield key, NODE_TYPE_INTERFACE if key in graph.interfaces else NODE_TYPE_CLASS, deps
+    for deps in graph.adjacency.values():
+        for e in deps:
+            if e not in seen:
+                seen.add(e)
+                yield e, NODE_TYPE_EXTERNAL, []
+
+
+def _iter_edges(graph):
+    for key, deps in graph.adjacency.items():
+        for e in deps:
+            yield key, e
+
+
+def export_jsonl(graph, f):
+    """
+    One JSON object of {id, type, root, deps} per line.
+    """
+    roots = set(graph.roots)
+    for key, node_type, deps in _iter_nodes(graph):
+        f.write(json.dumps({'id': key, 'type': node_type, 'root': key in roots, 'deps': deps}, sort_keys=True))
+        f.write('\n')
+
+
+def export_csv(graph, f):
+    """
+    Edge list with the source,target header.
+    """
+    writer = csv.writer(f, lineterminator='\n')
+    writer.writerow(['source', 'target'])
+    for edge in _iter_edges(graph):
+        writer.writerow(edge)
+
+
+def _dot_quote(s):
+    return '"%s"' % s.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def export_dot(graph, f):
+    f.write('digraph dependency {\n')
+    for key, node_type, _ in _iter_nodes(graph):
+        f.write('    %s [type=%s];\n' % (_dot_quote(key), node_type))
+    for source, target in _iter_edges(graph):
+        f.write('    %s -> %s;\n' % (_dot_quote(source), _dot_quote(target)))
+    f.write('}\n')
+
+
+def export_graphml(graph, f):
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+    f.write('  <key id="type" for="node" attr.name="type" attr.type="string"/>\n')
+    f.write('  <graph id="dependency" edgedefault="directed">\n')
+    for key, node_type, _ in _iter_nodes(graph):
+        f.write('    <node id=%s><data key="type">%s</data></node>\n' % (quoteattr(key), escape(node_type)))
+    for source, target in _iter_edges(graph):
+        f.write('    <edge source=%s target=%s/>\n' % (quoteattr(source), quoteattr(target)))
+    f.write('  </graph>\n')
+    f.write('</graphml>\n')
+
+
+def export_npz(graph, f):
+    """
+    CSR arrays and class keys of graph_matrix.JavaGraphMatrix, the classes out of the project are dropped.
+    """
+    JavaGraphMatrix.from_graph(graph).save(f)
+
+
+EXPORT_FORMATS = {
+    'jsonl': export_jsonl,
+    'csv': export_csv,
+    'dot': export_dot,
+    'graphml': export_graphml,
+    'npz': export_npz,
+}
+
+
+def get_export_format(file_name):
+    """
+    Guess the export format by the file extension, e.g. deps.csv.gz is csv.
+    """
+    if file_name.endswith('.gz'):
+        file_name = file_name[:-3]
+    ext = os.path.splitext(file_name)[1][1:].lower()
+    return ext if ext in EXPORT_FORMATS else None
+
+
+def export_graph(graph, file_name, export_format=None, compress=None):
+    """
+    Write the dependency graph to the file incrementally, so the memory doesn't grow by the output size.
+
+    :param graph: core.JavaDependencyGraph
+    :param file_name: output file path
+    :param export_format: one of EXPORT_FORMATS, guessed by the file extension if it's None
+    :param compress: gzip the output, it's decided by the .gz extension if it's None
+    :return: whether the graph is exported
+    """
+    export_format = export_format or get_export_format(file_name)
+    if export_format not in EXPORT_FORMATS:
+        logging.error('unknown export format of %s: %s' % (file_name, export_format))
+        return False
+    if export_format == 'npz' and not has_numpy():
+        logging.error('npz export of %s needs NumPy' % file_name)
+        return False
+    if compress is None:
+        compress = file_name.endswith('.gz')
+    with _open_output(file_name, compress) as f:
+        EXPORT_FORMATS[export_format](graph, f)
+    return True
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import sys
+
+from collections import OrderedDict
+
+import instrument
+from cli_helper import *
+from core import get_impl_map, get_proj_class_map, get_proj_dependency_graph
+from graph_metrics import DEFAULT_TOP_N, PAGERANK_DAMPING, PAGERANK_MAX_ITERATIONS, PAGERANK_TOLERANCE, get_top_metrics
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def has_numpy():
+    return np is not None
+
+
+class JavaGraphMatrix(object):
+    """
+    Dependency graph of the project classes as CSR arrays, the dependencies of the class i are
+    indices[indptr[i]:indptr[i + 1]]. The class ids follow the order of the class keys, the classes out of the
+    project are dropped. It needs NumPy.
+    """
+
+    def __init__(self, keys, indptr, indices):
+        self.keys = keys  # Class id -> class key
+        self.indptr = indptr  # int32 array of the row offsets
+        self.indices = indices  # int32 array of the dependency class ids
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        :param graph: core.JavaDependencyGraph
+        """
+        keys = sorted(graph.adjacency.keys())
+        key_ids = {e: i for i, e in enumerate(keys)}
+        indptr = np.zeros(len(keys) + 1, dtype=np.int32)
+        indices = []
+        for i, key in enumerate(keys):
+            indices += sorted({key_ids[e] for e in graph.adjacency[key] if e in key_ids})
+            indptr[i + 1] = len(indices)
+        return cls(keys, indptr, np.array(indices, dtype=np.int32))
+
+    def save(self, f):
+        """
+        Save the arrays and the class keys to a .npz file.
+
+        :param f: file name or file object
+        """
+        np.savez_compressed(f, indptr=self.indptr, indices=self.indices, keys=np.array(self.keys, dtype='U'))
+
+    @classmethod
+    def load(cls, f):
+        data = np.load(f)
+        return cls(data['keys'].tolist(), data['indptr'], data['indices'])
+
+    def get_out_degree(self):
+        return np.diff(self.indptr)
+
+    def get_in_degree(self):
+        return np.bincount(self.indices, minlength=len(self.keys))
+
+    def get_pagerank(self, damping=PAGERANK_DAMPING):
+        """
+        PageRank by the power iteration like graph_metrics, the rank of a class flows to its dependencies.
+        """
+        n = len(self.keys)
+        if not n:
+            return np.zeros(0)
+        out_degree = self.get_out_degree()
+        sources = np.repeat(np.arange(n, dtype=np.int32), out_degree)
+        dangling = out_degree == 0
+        rank = np.full(n, 1.0 / n)
+        for _ in range(PAGERANK_MAX_ITERATIONS):
+            share = np.where(dangling, 0.0, rank / np.maximum(out_degree, 1))
+            new_rank = damping * np.bincount(self.indices, weights=share[sources], minlength=n)
+            new_rank += (1.0 - damping + damping * rank[dangling].sum()) / n
+            delta = np.abs(new_rank - rank).sum()
+            rank = new_rank
+            if delta < PAGERANK_TOLERANCE:
+                break
+        return rank
+
+    def to_dict(self, values):
+        """
+        :param values: array of a value per class id
+        :return: class key -> value
+        """
+        return dict(zip(self.keys, values.tolist()))
+
+
+def get_class_map_matrix(class_map, impl_map):
+    """
+    Build the matrix of the field dependencies of all the project classes, where an interface depends on all its
+    implementations like core.get_proj_dependency_graph with all_impls.
+    """
+    return JavaGraphMatrix.from_graph(get_proj_dependency_graph(class_map, impl_map, all_impls=True))
+
+
+def get_matrix_metrics(matrix):
+    """
+    :param matrix: JavaGraphMatrix
+    :return: metric name -> array of the values by the class ids
+    """
+    return OrderedDict([
+        ('in_degree', matrix.get_in_degree()),
+        ('out_degree', matrix.get_out_degree()),
+        ('pagerank', matrix.get_pagerank()),
+    ])
+
+
+def get_proj_matrix(proj_dir, **class_map_options):
+    """
+    :param class_map_options: cache_dir, workers and ignore_dirs of core.get_proj_class_map
+    :return: JavaGraphMatrix of get_class_map_matrix
+    """
+    with instrument.phase('get_proj_class_map'):
+        # Only the fields are needed.
+        class_map = get_proj_class_map(proj_dir, lazy_methods=True, **class_map_options)
+    with instrument.phase('get_impl_map'):
+        impl_map = get_impl_map(class_map)
+    with instrument.phase('get_matrix'):
+        return get_class_map_matrix(class_map, impl_map)
+
+
+def main():
+    parser = build_arg_parser('Export the dependency graph of all the Java classes of the project as CSR arrays and '
+                              'rank the classes by them.')
+    parser.add_argument('proj_dir', help='analyse project directory')
+    parser.add_argument('-o', '--output', help='.npz file of the CSR arrays and the class keys')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_N,
+                        help='count of the printed top classes of every metric (default: %(default)s)')
+    args = parser.parse_args()
+    setup_logging(args)
+    setup_instrument(args)
+    if not has_numpy():
+        logging.error('graph_matrix.py needs NumPy')
+        sys.exit(-1)
+    if args.daemon:
+        logging.error('graph_matrix.py doesn\'t support --daemon')
+        sys.exit(-1)
+    matrix = get_proj_matrix(args.proj_dir, **get_class_map_options(args))
+    if args.output:
+        matrix.save(args.output)
+    with instrument.phase('rank'):
+        metrics = get_matrix_metrics(matrix)
+        top_metrics = get_top_metrics(OrderedDict((k, matrix.to_dict(v)) for k, v in metrics.items()), args.top)
+    write_instrument_report(args)
+    print(json.dumps(top_metrics, indent=4))
+
+
+if __name__ == '__main__':
+    main()
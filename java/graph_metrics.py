@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+import heapq
+
+from collections import OrderedDict
+
+DEFAULT_TOP_N = 30
+PAGERANK_DAMPING = 0.85
+PAGERANK_MAX_ITERATIONS = 50
+PAGERANK_TOLERANCE = 1e-6
+
+
+def get_strongly_connected_components(succ):
+    """
+    Tarjan's algorithm without recursion, so deep dependency chains don't hit the recursion limit.
+
+    :param succ: node index -> successor node indices
+    :return: components as lists of node indices, in reverse topological order, i.e. a component comes after all
+        the components it depends on
+    """
+    n = len(succ)
+    node_index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = []
+    res = []
+    counter = 0
+    for start in range(n):
+        if node_index[start] != -1:
+            continue
+        node_index[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack[start] = True
+        work = [(start, iter(succ[start]))]
+        while work:
+            v, it = work[-1]
+            advanced = False
+            for w in it:
+                if node_index[w] == -1:
+                    node_index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, iter(succ[w])))
+                    advanced = True
+                    break
+                elif on_stack[w]:
+                    low[v] = min(low[v], node_index[w])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                u = work[-1][0]
+                low[u] = min(low[u], low[v])
+            if low[v] == node_index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                res.append(component)
+    return res
+
+
+class _IndexedGraph(object):
+    """
+    Project classes of a dependency graph as node indices, the classes out of the project are dropped.
+    """
+
+    def __init__(self, graph):
+        self.nodes = list(graph.adjacency.keys())  # Node index -> class key
+        node_indices = {e: i for i, e in enumerate(self.nodes)}
+        self.succ = [sorted({node_indices[e] for e in deps if e in node_indices})
+                     for deps in graph.adjacency.values()]
+        self.roots = [node_indices[e] for e in graph.roots if e in node_indices]
+        self.components = get_strongly_connected_components(self.succ)[::-1]  # In topological order
+        self.node_components = [0] * len(self.nodes)  # Node index -> component index
+        for i, component in enumerate(self.components):
+            for v in component:
+                self.node_components[v] = i
+        self.component_succ = []  # Component index -> successor component indices
+        for component in self.components:
+            self.component_succ.append(sorted({self.node_components[w] for v in component for w in self.succ[v]}
+                                              - {self.node_components[component[0]]}))
+
+
+def _get_fan_in(indexed):
+    res = [0] * len(indexed.nodes)
+    for ws in indexed.succ:
+        for w in ws:
+            res[w] += 1
+    return res
+
+
+def _get_transitive_fan_in(indexed):
+    # Ancestors of every component as an int bitset of the node indices, merged in topological order.
+    ancestors = [0] * len(indexed.components)
+    res = [0] * len(indexed.nodes)
+    for i, component in enumerate(indexed.components):
+        members = 0
+        for v in component:
+            members |= 1 << v
+        count = bin(ancestors[i]).count('1')
+        for v in component:
+            # The other members of a cycle depend on the node too.
+            res[v] = count + len(component) - 1
+        for c in indexed.component_succ[i]:
+            ancestors[c] |= ancestors[i] | members
+    return res
+
+
+def _get_paths(indexed):
+    # Count of the dependency paths from the start classes, a cycle is counted as one node.
+    paths = [0] * len(indexed.components)
+    for v in indexed.roots:
+        paths[indexed.node_components[v]] += 1
+    for i in range(len(indexed.components)):
+        for c in indexed.component_succ[i]:
+            paths[c] += paths[i]
+    return [paths[indexed.node_components[v]] for v in range(len(indexed.nodes))]
+
+
+def _get_pagerank(indexed, damping=PAGERANK_DAMPING):
+    n = len(indexed.nodes)
+    if not n:
+        return []
+    rank = [1.0 / n] * n
+    for _ in range(PAGERANK_MAX_ITERATIONS):
+        # The rank of a class flows to its dependencies, the classes without dependencies spread it evenly.
+        dangling = sum(rank[v] for v in range(n) if not indexed.succ[v])
+        new_rank = [(1.0 - damping + damping * dangling) / n] * n
+        for v, ws in enumerate(indexed.succ):
+            if ws:
+                share = damping * rank[v] / len(ws)
+                for w in ws:
+                    new_rank[w] += share
+        delta = sum(abs(new_rank[v] - rank[v]) for v in range(n))
+        rank = new_rank
+        if delta < PAGERANK_TOLERANCE:
+            break
+    return rank
+
+
+def _get_fan_out(indexed):
+    return [len(e) for e in indexed.succ]
+
+
+# Metric name -> function of the _IndexedGraph, in the order of the report.
+GRAPH_METRICS = OrderedDict([
+    ('fan_in', _get_fan_in),
+    ('transitive_fan_in', _get_transitive_fan_in),
+    ('fan_out', _get_fan_out),
+    ('paths', _get_paths),
+    ('pagerank', _get_pagerank),
+])
+
+
+def get_graph_metrics(graph, metric_names=None):
+    """
+    Rank the project classes of the dependency graph.
+
+    fan_in: count of the classes depending on the class directly
+    transitive_fan_in: count of the classes depending on the class directly or indirectly
+    fan_out: count of the project classes the class depends on directly
+    paths: count of the dependency paths from the start classes to the class, the members of a cycle share one count
+    pagerank: PageRank of the class when the rank flows along the dependencies
+
+    :param graph: core.JavaDependencyGraph
+    :param metric_names: names of the computed metrics, all of them if it's None
+    :return: metric name -> {class key: value}
+    """
+    indexed = _IndexedGraph(graph)
+    return OrderedDict((k, dict(zip(indexed.nodes, f(indexed)))) for k, f in GRAPH_METRICS.items()
+                       if metric_names is None or k in metric_names)
+
+
+def get_top_metrics(metrics, top_n=DEFAULT_TOP_N):
+    """
+    :param metrics: result of get_graph_metrics
+    :return: metric name -> [(class key, value)] of the top n classes, the ties are ordered by the class keys
+    """
+    return OrderedDict((k, heapq.nsmallest(top_n, v.items(), key=lambda x: (-x[1], x[0])))
+                       for k, v in metrics.items())
+
+
+def get_dependency_cycles(graph):
+    """
+    Find the dependency cycles of the project classes by the strongly connected components, which runs in linear
+    time of the classes and the dependencies.
+
+    :param graph: core.JavaDependencyGraph, built with all_impls to include all the interface -> implementation edges
+    :return: {cycles: [[class key]], components: [[class key]], edges: [(component index, component index)]}, the
+        cycles are the components of more than one class or depending on itself, largest first. The components are
+        the nodes of the condensed DAG in topological order, the edges are between the component indices.
+    """
+    indexed = _IndexedGraph(graph)
+    components = [sorted(indexed.nodes[v] for v in e) for e in indexed.components]
+    cycles = [components[i] for i, e in enumerate(indexed.components)
+              if len(e) > 1 or e[0] in indexed.succ[e[0]]]
+    cycles.sort(key=lambda x: (-len(x), x[0]))
+    edges = [(i, j) for i, e in enumerate(indexed.component_succ) for j in e]
+    return OrderedDict([('cycles', cycles), ('components', components), ('edges', edges)])
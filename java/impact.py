@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import json
+import sys
+
+import instrument
+from cli_helper import *
+from core import *
+
+
+def _get_class_keys(classes, class_map):
+    # A class is given by its key or by its Java file, e.g. a file changed in the commit.
+    res = []
+    for e in classes:
+        key = class_map.get_key_by_path(e) if e.endswith('.java') else e
+        if key not in class_map:
+            logging.error('%s not in class_map' % e)
+            continue
+        res.append(key)
+    return res
+
+
+def get_impact(classes, proj_dir, max_depth=None, **class_map_options):
+    """
+    Get the classes affected by the change of the classes, i.e. the classes depending on them directly or
+    indirectly.
+
+    :param classes: class keys or Java file paths
+    :param max_depth: count of the dependency levels to follow, no limit if it's None
+    :return: [{class, depth, file}] of the dependents, the nearest first
+    """
+    # The dependency only needs the class headers.
+    with instrument.phase('get_proj_class_map'):
+        class_map = get_proj_class_map(proj_dir, lazy_methods=True, **class_map_options)
+    with instrument.phase('get_impl_map'):
+        impl_map = get_impl_map(class_map)
+    with instrument.phase('build_reverse_index'):
+        reverse_index = JavaReverseDependencyIndex(class_map, impl_map)
+    return get_impact_by_reverse_index(classes, class_map, reverse_index, max_depth)
+
+
+def get_impact_by_reverse_index(classes, class_map, reverse_index, max_depth=None):
+    """
+    Get the classes affected by the change of the classes by the parsed project, see get_impact.
+
+    :param reverse_index: core.JavaReverseDependencyIndex of the class map
+    """
+    with instrument.phase('get_dependents'):
+        dependents = reverse_index.get_dependents(_get_class_keys(classes, class_map), max_depth)
+    return [OrderedDict([('class', k), ('depth', v), ('file', class_map.get_path_by_key(k))])
+            for k, v in dependents.items()]
+
+
+def main():
+    parser = build_arg_parser('Find the classes depending on the given Java classes directly or indirectly.')
+    parser.add_argument('classes', help='comma separated class keys or Java files, e.g. the changed files')
+    parser.add_argument('proj_dir', help='analyse project directory')
+    parser.add_argument('--max-depth', type=int, help='count of the dependency levels to follow, no limit if it\'s '
+                                                      'not given')
+    parser.add_argument('-o', '--output', help='file of the dependents in JSON, they are printed if it\'s not given')
+    args = parser.parse_args()
+    setup_logging(args)
+    setup_instrument(args)
+    classes = [e.strip() for e in args.classes.split(',') if e.strip()]
+    proj_dir = args.proj_dir
+    if not classes or not proj_dir:
+        logging.error('Analyse classes or project dir is empty')
+        sys.exit(-1)
+    if args.daemon:
+        # The daemon has its own working directory.
+        classes = [get_abs_path(e) if e.endswith('.java') else e for e in classes]
+        res = request_daemon(args, 'impact', classes=classes, max_depth=args.max_depth)
+    else:
+        res = get_impact(classes, proj_dir, args.max_depth, **get_class_map_options(args))
+    write_instrument_report(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(res, f, indent=4)
+    else:
+        print(json.dumps(res, indent=4))
+
+
+if __name__ == '__main__':
+    main()
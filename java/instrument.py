@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import heapq
+import json
+import os
+import time
+
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Bump this if the layout of the report changes.
+REPORT_VERSION = 3
+DEFAULT_TOP_FILES = 10
+COUNTER_NAMES = ('files_walked', 'files_parsed', 'lines_formatted', 'methods_found', 'variables_resolved',
+                 'dependency_nodes_expanded')
+
+# Report of the current process, the instrumentation is disabled if it's None.
+_report = None
+
+
+class _NullPhase(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def _get_cpu_time():
+    t = os.times()
+    return t[0] + t[1]
+
+
+def _get_max_rss():
+    if resource is None:
+        return None
+    # Max RSS of the whole process so far, which is in KB on Linux. It's not the peak of a phase.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _Phase(object):
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+        self._wall = None
+        self._cpu = None
+
+    def __enter__(self):
+        self._wall = time.time()
+        self._cpu = _get_cpu_time()
+        return self
+
+    def __exit__(self, *args):
+        phase = self.report.phases.setdefault(self.name, OrderedDict([('wall', 0.0), ('cpu', 0.0), ('max_rss', None)]))
+        phase['wall'] += time.time() - self._wall
+        phase['cpu'] += _get_cpu_time() - self._cpu
+        max_rss = _get_max_rss()
+        if max_rss is not None:
+            phase['max_rss'] = max(phase['max_rss'] or 0, max_rss)
+        return False
+
+
+class InstrumentReport(object):
+    """
+    Phase times, counters and the slowest files of one run.
+    """
+
+    def __init__(self, top_files=DEFAULT_TOP_FILES):
+        self.top_files = top_files  # Count of the slowest files to keep
+        self.phases = OrderedDict()  # Phase name -> {wall, cpu, max_rss}
+        self.counters = OrderedDict((e, 0) for e in COUNTER_NAMES)
+        self._slowest_files = []  # Min heap of (seconds, file name)
+
+    def record_file(self, file_name, seconds):
+        if len(self._slowest_files) < self.top_files:
+            heapq.heappush(self._slowest_files, (seconds, file_name))
+        elif self._slowest_files and seconds > self._slowest_files[0][0]:
+            heapq.heapreplace(self._slowest_files, (seconds, file_name))
+
+    def to_dict(self):
+        return OrderedDict([
+            ('version', REPORT_VERSION),
+            ('phases', self.phases),
+            ('counters', self.counters),
+            ('slowest_files', [OrderedDict([('file', e[1]), ('seconds', e[0])])
+                               for e in sorted(self._slowest_files, reverse=True)]),
+        ])
+
+
+def enable(top_files=DEFAULT_TOP_FILES):
+    global _report
+    _report = InstrumentReport(top_files)
+    return _report
+
+
+def disable():
+    global _report
+    _report = None
+
+
+def is_enabled():
+    return _report is not None
+
+
+def get_report():
+    return _report
+
+
+def phase(name):
+    """
+    Context manager measuring the wall time and the CPU time of a phase, and the max RSS of the process at its end.
+    The times of the same phase are summed up.
+    """
+    if _report is None:
+        return _NULL_PHASE
+    return _Phase(_report, name)
+
+
+def count(name, n=1):
+    if _report is not None:
+        _report.counters[name] = _report.counters.get(name, 0) + n
+
+
+def record_file(file_name, seconds):
+    if _report is not None:
+        _report.record_file(file_name, seconds)
+
+
+def pop_counters():
+    """
+    Get and reset the counters, e.g. to send the counters of a worker process back.
+
+    :return: name -> count, None if the instrumentation is disabled
+    """
+    if _report is None:
+        return None
+    res = dict(_report.counters)
+    for k in _report.counters:
+        _report.counters[k] = 0
+    return res
+
+
+def merge_counters(counters):
+    if _report is None or not counters:
+        return
+    for k, v in counters.items():
+        count(k, v)
+
+
+def write_report(file_name):
+    if _report is None:
+        return
+    with open(file_name, 'w') as f:
+        json.dump(_report.to_dict(), f, indent=4)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+import re
+from collections import namedtuple
+
+TOKEN_CODE = 'code'  # Code between the literals and the comments, which may span multiple lines
+TOKEN_STRING = 'string'  # String literal or text block, quotes included
+TOKEN_CHAR = 'char'  # Char literal, quotes included
+TOKEN_COMMENT = 'comment'  # Line comment or block comment
+
+# Literals end at the line end if they are not closed, so a broken line doesn't swallow the rest of the file.
+# The lookahead lets the regex engine skip the plain code quickly.
+JAVA_TOKEN_REGEX = re.compile(r'''
+    (?=["'/])(?:
+    (?P<string>"""[\s\S]*?(?:"""|\Z)|"(?:[^"\\\n]|\\.)*"?)
+  | (?P<char>'(?:[^'\\\n]|\\.)*'?)
+  | (?P<comment>/\*[\s\S]*?(?:\*/|\Z)|//[^\n]*))
+''', re.VERBOSE)
+LITERAL_CONTENT_REGEX = re.compile(r'[^\n]')
+CODE_BLOCK_REGEX = re.compile(r'[{}();=]')
+BRACE_REGEX = re.compile(r'[{}]')
+
+
+class JavaToken(namedtuple('JavaToken', ['kind', 'text', 'line'])):
+    """
+    Token of the Java source, the line index starts from 1.
+    """
+    __slots__ = ()
+
+
+def tokenize_java(source, line=1):
+    """
+    Split the Java source into tokens in one pass, so the brackets and semicolons in the literals and the comments
+    are never mistaken for code.
+
+    :param source: Java source text
+    :param line: line index of the start of the source
+    :return: list of JavaToken
+    """
+    res = []
+    if not source:
+        return res
+    pos = 0
+    for m in JAVA_TOKEN_REGEX.finditer(source):
+        start = m.start()
+        if start > pos:
+            code = source[pos:start]
+            res.append(JavaToken(TOKEN_CODE, code, line))
+            line += code.count('\n')
+        text = m.group()
+        res.append(JavaToken(m.lastgroup, text, line))
+        line += text.count('\n')
+        pos = m.end()
+    if pos < len(source):
+        res.append(JavaToken(TOKEN_CODE, source[pos:], line))
+    return res
+
+
+def _is_body_header(tail):
+    # The code between the last ) and the {, e.g. "" of "void f() {" or "throws IOException" of a method.
+    tail = tail.strip()
+    return not tail or tail.startswith('throws ')
+
+
+def blank_method_bodies(tokens):
+    """
+    Blank the blocks after a ) and an optional throws clause out of an assignment, i.e. the bodies of the methods and
+    the constructors, so the class header and the fields can be formatted without them. The braces and the line
+    breaks are kept, so the lines don't move.
+
+    :param tokens: list of JavaToken of tokenize_java
+    :return: list of JavaToken
+    """
+    res = []
+    depth = 0  # Depth in the blanked block, 0 if the code is kept
+    tail = None  # Code since the last ) of the kept code, None if a statement or a block starts after it
+    parens = 0  # Depth in the parentheses of the kept code
+    assign = False  # Whether the statement has = out of the parentheses, e.g. an anonymous class of a field
+    for t in tokens:
+        if t.kind != TOKEN_CODE:
+            if depth:
+                res.append(JavaToken(TOKEN_CODE, '\n' * t.text.count('\n'), t.line))
+                continue
+            if tail is not None and t.kind != TOKEN_COMMENT:
+                tail += t.text
+            res.append(t)
+            continue
+        text = t.text
+        parts = []
+        start = 0  # Start of the text not added to parts yet
+        tail_start = 0  # Start of the text not added to tail yet
+        pos = 0
+        while True:
+            m = (BRACE_REGEX if depth else CODE_BLOCK_REGEX).search(text, pos)
+            if not m:
+                break
+            pos = m.end()
+            c = m.group()
+            if depth:
+                depth += 1 if c == '{' else -1
+                if not depth:
+                    parts.append('\n' * text.count('\n', start, m.start()))
+                    start = m.start()
+            elif c == '(':
+                parens += 1
+            elif c == ')':
+                parens = max(parens - 1, 0)
+                tail = ''
+                tail_start = pos
+            elif c == '=':
+                assign = assign or not parens
+                tail = None
+            else:
+                if c == '{' and not assign and tail is not None and _is_body_header(tail + text[tail_start:m.start()]):
+                    parts.append(text[start:pos])
+                    start = pos
+                    depth = 1
+                if c == ';':
+                    parens = 0
+                assign = False
+                tail = None
+        if depth:
+            parts.append('\n' * text.count('\n', start))
+        else:
+            parts.append(text[start:])
+            if tail is not None:
+                tail += text[tail_start:]
+        res.append(JavaToken(TOKEN_CODE, ''.join(parts), t.line))
+    return res
+
+
+def _mask_literal(text):
+    quote_len = 3 if text.startswith('"""') else 1
+    if len(text) <= quote_len * 2:
+        return text
+    content = text[quote_len:-quote_len]
+    content = LITERAL_CONTENT_REGEX.sub(' ', content) if '\n' in content else ' ' * len(content)
+    return text[:quote_len] + content + text[-quote_len:]
+
+
+def get_code_lines(tokens):
+    """
+    Rebuild the non-empty code lines of the tokens, the comments are dropped.
+
+    The masked text of a line has the same length as the text, but the contents of the literals are blanked, so the
+    brackets and semicolons in it are all code.
+
+    :param tokens: list of JavaToken
+    :return: [(line index, stripped text, stripped masked text)]
+    """
+    text = []
+    masked = []
+    for t in tokens:
+        if t.kind == TOKEN_CODE:
+            text.append(t.text)
+            masked.append(t.text)
+        elif t.kind == TOKEN_COMMENT:
+            line_breaks = '\n' * t.text.count('\n')
+            text.append(line_breaks)
+            masked.append(line_breaks)
+        else:
+            text.append(t.text)
+            masked.append(_mask_literal(t.text))
+    res = []
+    index = tokens[0].line - 1 if tokens else 0
+    for line, masked_line in zip(''.join(text).split('\n'), ''.join(masked).split('\n')):
+        index += 1
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if line == masked_line:
+            res.append((index, stripped, stripped))
+        else:
+            start = len(line) - len(line.lstrip())
+            res.append((index, stripped, masked_line[start:start + len(stripped)]))
+    return res
@@ -1,6 +1,7 @@
 import sys
+import instrument
+from cli_helper import *
 from core import *
-from git_helper import *
 from collections import defaultdict
 
 
@@ -50,9 +51,9 @@ def _is_line_invoked_method(line):
 def _is_line_null_processed(line_info):
     if not line_info:
         return False
-    raw_line = line_info['raw_line']
-    var_index = line_info['var_index']
-    line_spt = line_info['line_spt']
+    raw_line = line_info.raw_line
+    var_index = line_info.var_index
+    line_spt = line_info.line_spt
     var_name = line_spt[var_index]
     raw_line = raw_line.replace(' ', '')
     raw_line = SINGLE_QUOTE_REGEX.sub('', QUOTE_REGEX.sub('', raw_line))
@@ -80,10 +81,10 @@ def _is_line_null_processed(line_info):
 def _is_line_may_invoke_null_pointer(line_info):
     if not line_info:
         return False
-    var_index = line_info['var_index']
-    line_spt = line_info['line_spt']
-    raw_line = line_info['raw_line']
-    sep = map(lambda x: x.strip(), line_info['separated'])
+    var_index = line_info.var_index
+    line_spt = line_info.line_spt
+    raw_line = line_info.raw_line
+    sep = map(lambda x: x.strip(), line_info.separated)
 
     if 'for' in line_spt and ':' in sep and var_index > sep.index(':'):
         return True
@@ -105,7 +106,7 @@ def _analyse_method_diff_null_pointer_helper(method, changed_lines):
         line_info = var_info['line_info']
         for info in line_info:
             if _is_line_may_invoke_null_pointer(info):
-                var_processed_reversed_map[info['line_index']] = var_name
+                var_processed_reversed_map[info.line_index] = var_name
 
     for var_name, var_info in all_vars.items():
         if 'line_info' not in var_info:
@@ -113,7 +114,7 @@ def _analyse_method_diff_null_pointer_helper(method, changed_lines):
         line_info = var_info['line_info']
         for info in line_info:
             if _is_line_null_processed(info):
-                var_processed_map[var_name] = info['line_index']
+                var_processed_map[var_name] = info.line_index
                 break
 
     changed_reversed_map = {k: v for k, v in var_processed_reversed_map.items() if k in changed_lines}
@@ -161,28 +162,39 @@ def process_null_pointer(class_map, diff_map):
 
 
 def main():
-    if len(sys.argv) < 2:
-        logging.error('Please input the branch needs to be checked')
-        sys.exit(-1)
-    if len(sys.argv) < 3:
-        logging.error('Please then input the analyse project dir')
-        sys.exit(-1)
-    branch_name = sys.argv[1]
-    proj_dir = sys.argv[2]
+    parser = build_arg_parser('Check the possible null pointers of the changed lines against master.')
+    parser.add_argument('branch_name', help='branch needs to be checked')
+    parser.add_argument('proj_dir', help='analyse project directory')
+    args = parser.parse_args()
+    setup_logging(args)
+    setup_instrument(args)
+    branch_name = args.branch_name
+    proj_dir = args.proj_dir
     if not branch_name or not proj_dir:
         logging.error('branch name or project directory is none')
         sys.exit(-1)
-    diff_map = diff_against_master(branch_name, proj_dir)
-    class_map = get_proj_class_map(proj_dir)
-    setup_class_map_method_dep(class_map)
-    process_res = process_null_pointer(class_map, diff_map)
+    if args.daemon:
+        process_res = request_daemon(args, 'npe', branch_name=branch_name)
+    else:
+        # GitPython is only needed by the diff, so process_null_pointer can be imported without it.
+        from git_helper import diff_against_master
+        with instrument.phase('diff_against_master'):
+            diff_map = diff_against_master(branch_name, proj_dir)
+        with instrument.phase('get_proj_class_map'):
+            class_map = get_proj_class_map(proj_dir, **get_class_map_options(args))
+        with instrument.phase('setup_class_map_method_dep'):
+            setup_class_map_method_dep(class_map)
+        with instrument.phase('process_null_pointer'):
+            process_res = process_null_pointer(class_map, diff_map)
+    write_instrument_report(args)
     print('Analyse null pointer result:')
     for k, v in process_res.items():
         print('-' * 100)
         print(k)
         for method_name, var_info in v.items():
             print('\t%s:' % method_name)
-            for line, var_name in sorted(var_info.items()):
+            # The lines from the daemon are the keys of a JSON object, which are strings.
+            for line, var_name in sorted(var_info.items(), key=lambda x: int(x[0])):
                 print('\t\t%s: %s' % (line, var_name))
 
 
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import bisect
+import logging
+
+from collections import OrderedDict
+
+from graph_metrics import get_strongly_connected_components
+
+RULE_SEPARATOR = '->'
+
+
+def _iter_bits(bits):
+    # Indices of the set bits, from the lowest one.
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class JavaReachabilityIndex(object):
+    """
+    Transitive closure of a dependency graph. The class ids follow the order of the class keys, so the classes of a
+    package are a range of ids. Every strongly connected component keeps the ids reachable from it as an int bitset,
+    so a reachability query is a bit test.
+    """
+
+    def __init__(self, graph):
+        """
+        :param graph: core.JavaDependencyGraph, e.g. of core.get_proj_dependency_graph with all_impls
+        """
+        self.keys = sorted(graph.adjacency.keys())  # Class id -> class key
+        self.key_ids = {e: i for i, e in enumerate(self.keys)}
+        succ = [sorted({self.key_ids[e] for e in graph.adjacency[key] if e in self.key_ids}) for key in self.keys]
+        self.node_components = [0] * len(self.keys)  # Class id -> component index
+        self._reach = []  # Component index -> bitset of the reachable class ids
+        # A component comes after all the components it depends on.
+        for i, component in enumerate(get_strongly_connected_components(succ)):
+            members = 0
+            for v in component:
+                self.node_components[v] = i
+                members |= 1 << v
+            reach = 0
+            cyclic = len(component) > 1
+            for v in component:
+                for w in succ[v]:
+                    c = self.node_components[w]
+                    if c == i:
+                        cyclic = True
+                    else:
+                        reach |= self._reach[c] | (1 << w)
+            self._reach.append(reach | members if cyclic else reach)
+
+    def get_reachable_bits(self, key):
+        """
+        :return: bitset of the class ids the class depends on directly or indirectly, 0 if it's not indexed
+        """
+        if key not in self.key_ids:
+            return 0
+        return self._reach[self.node_components[self.key_ids[key]]]
+
+    def depends_on(self, source, target):
+        """
+        Whether the source class depends on the target class directly or indirectly.
+        """
+        return target in self.key_ids and bool(self.get_reachable_bits(source) >> self.key_ids[target] & 1)
+
+    def get_id_range(self, pattern):
+        """
+        :param pattern: class key, package name ending with .* for the classes of the package and its sub packages,
+            or * for all the classes
+        :return: [start, end) of the class ids matched by the pattern
+        """
+        if pattern == '*':
+            return 0, len(self.keys)
+        if pattern.endswith('.*'):
+            prefix = pattern[:-1]
+            # '/' is the character after '.', so the range ends before the first key out of the package.
+            return bisect.bisect_left(self.keys, prefix), bisect.bisect_left(self.keys, prefix[:-1] + '/')
+        if pattern in self.key_ids:
+            return self.key_ids[pattern], self.key_ids[pattern] + 1
+        return 0, 0
+
+    def get_keys(self, bits):
+        return [self.keys[e] for e in _iter_bits(bits)]
+
+
+def parse_rules(lines):
+    """
+    Parse the forbidden dependency rules, one "source pattern -> target pattern" per line, e.g.
+    "com.a.web.* -> com.a.dao.*". The patterns are the ones of JavaReachabilityIndex.get_id_range, the empty lines
+    and the lines starting with # are skipped.
+
+    :return: [(source pattern, target pattern)]
+    """
+    res = []
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        source, sep, target = line.partition(RULE_SEPARATOR)
+        if not sep or not source.strip() or not target.strip():
+            logging.error('bad rule at line %d: %s' % (i + 1, line))
+            continue
+        res.append((source.strip(), target.strip()))
+    return res
+
+
+def check_rules(index, rules, max_sources=None):
+    """
+    Check the forbidden dependency rules against the reachability index.
+
+    :param index: JavaReachabilityIndex
+    :param rules: [(source pattern, target pattern)] of parse_rules
+    :param max_sources: count of the violating source classes to report of a rule, no limit if it's None
+    :return: [{rule, source, targets}] of the source classes depending on the forbidden classes, by the rules order
+    """
+    res = []
+    for source_pattern, target_pattern in rules:
+        start, end = index.get_id_range(target_pattern)
+        source_start, source_end = index.get_id_range(source_pattern)
+        if start >= end or source_start >= source_end:
+            logging.warning('rule %s %s %s matches no class' % (source_pattern, RULE_SEPARATOR, target_pattern))
+            continue
+        mask = (1 << end) - (1 << start)
+        count = 0
+        for i in range(source_start, source_end):
+            if max_sources is not None and count >= max_sources:
+                break
+            bits = index.get_reachable_bits(index.keys[i]) & mask
+            if bits:
+                count += 1
+                res.append(OrderedDict([('rule', '%s %s %s' % (source_pattern, RULE_SEPARATOR, target_pattern)),
+                                        ('source', index.keys[i]), ('targets', index.get_keys(bits))]))
+    return res
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from collections import OrderedDict
+
+import instrument
+from core import JavaDependencyGraph
+
+
+def build_graph(adjacency, roots=None):
+    """
+    Build a dependency graph by hand.
+
+    :param adjacency: [(class key, dependency class keys)]
+    :param roots: start class keys, the first class if it's None
+    """
+    graph = JavaDependencyGraph()
+    graph.adjacency = OrderedDict(adjacency)
+    graph.roots = roots if roots is not None else [adjacency[0][0]]
+    return graph
+
+
+class JavaProjectTestCase(unittest.TestCase):
+    """
+    Test case with a temporary Java project directory, which is removed after every test.
+    """
+
+    def setUp(self):
+        self.proj_dir = tempfile.mkdtemp(prefix='deepcode_test_')
+
+    def tearDown(self):
+        instrument.disable()
+        shutil.rmtree(self.proj_dir, ignore_errors=True)
+
+    def write_java(self, path, source):
+        """
+        :param path: file path relative to the project directory
+        :return: absolute file path
+        """
+        file_name = os.path.join(self.proj_dir, path)
+        if not os.path.isdir(os.path.dirname(file_name)):
+            os.makedirs(os.path.dirname(file_name))
+        with open(file_name, 'w') as f:
+            f.write(source)
+        return file_name
+
+    def write_class(self, package, name, body='', imports=(), header=None, module=''):
+        """
+        Write a class of src/main/java of the module.
+
+        :param header: class declaration, "public class <name>" if it's None
+        :return: absolute file path
+        """
+        lines = ['package %s;' % package, ''] + ['import %s;' % e for e in imports] + [''] + [
+            '%s {' % (header or 'public class %s' % name), body, '}', '']
+        path = os.path.join(module, 'src', 'main', 'java', package.replace('.', os.sep), '%s.java' % name)
+        return self.write_java(path, '\n'.join(lines))
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+import instrument
+from class_cache import ClassMapCache
+from core import JAVA_PARSER_VERSION, get_proj_class_map
+from tests.helper import JavaProjectTestCase
+
+
+class ClassMapCacheTest(JavaProjectTestCase):
+    def setUp(self):
+        super(ClassMapCacheTest, self).setUp()
+        self.cache_dir = os.path.join(self.proj_dir, 'cache')
+        self.write_class('com.a', 'A', 'private B b;', ['com.b.*'])
+        self.b_file = self.write_class('com.b', 'B', 'private String name;')
+        self.write_class('com.c', 'C', 'private int count;')
+
+    def _parse(self, **options):
+        report = instrument.enable()
+        class_map = get_proj_class_map(self.proj_dir, self.cache_dir, **options)
+        instrument.disable()
+        return class_map, report.counters['files_parsed']
+
+    def test_hit(self):
+        class_map, parsed = self._parse()
+        self.assertEqual(parsed, 3)
+        cached_map, parsed = self._parse()
+        self.assertEqual(parsed, 0)
+        self.assertEqual(list(cached_map.keys()), list(class_map.keys()))
+        self.assertEqual(cached_map['com.a.A'].fields, {'b': ('com.b.B', None)})
+
+    def test_modified(self):
+        self._parse()
+        self.write_class('com.b', 'B', 'private String title;')
+        class_map, parsed = self._parse()
+        self.assertEqual(parsed, 1)
+        self.assertEqual(class_map['com.b.B'].fields, {'title': ('String', None)})
+
+    def test_touched(self):
+        self._parse()
+        stat = os.stat(self.b_file)
+        os.utime(self.b_file, (stat.st_atime, stat.st_mtime + 10))
+        _, parsed = self._parse()
+        self.assertEqual(parsed, 0)
+
+    def test_new_class_of_wildcard_import(self):
+        self._parse()
+        self.write_class('com.b', 'D', 'private int id;')
+        class_map, parsed = self._parse()
+        # D, A which sees D through com.b.* and B of the same package, C is not affected.
+        self.assertEqual(parsed, 3)
+        self.assertIn('com.b.D', class_map)
+        self.assertEqual(class_map['com.a.A'].class_package_map['D'], 'com.b')
+
+    def test_deleted(self):
+        self._parse()
+        os.remove(self.b_file)
+        class_map, parsed = self._parse()
+        self.assertNotIn('com.b.B', class_map)
+        # A no longer sees B through com.b.*.
+        self.assertEqual(parsed, 1)
+
+    def test_parser_version(self):
+        self._parse()
+        cache_file = ClassMapCache.get_cache_file(self.cache_dir, self.proj_dir)
+        cache = ClassMapCache(cache_file, JAVA_PARSER_VERSION)
+        cache.load()
+        self.assertEqual(len(cache.entries), 3)
+        cache = ClassMapCache(cache_file, JAVA_PARSER_VERSION + 1)
+        cache.load()
+        self.assertEqual(cache.entries, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from core import get_class_filter, get_class_filters, get_dependency_graph, get_impl_map, get_proj_class_map
+from tests.helper import JavaProjectTestCase
+
+
+class ClassFilterTest(unittest.TestCase):
+    def test_none(self):
+        self.assertIsNone(get_class_filter())
+        self.assertEqual(get_class_filters(), (None, None))
+
+    def test_patterns(self):
+        class_filter = get_class_filter(include=['com.a', 'com.b.*Service'], exclude=['com.a.internal'])
+        self.assertTrue(class_filter('com.a.A'))
+        self.assertTrue(class_filter('com.a.b.B'))
+        self.assertFalse(class_filter('com.ab.A'))
+        self.assertTrue(class_filter('com.b.UserService'))
+        self.assertFalse(class_filter('com.b.UserDao'))
+        self.assertFalse(class_filter('com.a.internal.C'))
+
+    def test_regex(self):
+        class_filter = get_class_filter(include_regex=r'Service$', exclude_regex=r'\.legacy\.')
+        self.assertTrue(class_filter('com.a.UserService'))
+        self.assertFalse(class_filter('com.a.legacy.UserService'))
+        self.assertFalse(class_filter('com.a.UserDao'))
+
+    def test_expand_filter(self):
+        # Only the excludes apply to the dependencies.
+        class_filter, expand_filter = get_class_filters(include=['com.a'], exclude=['com.b.Hidden'])
+        self.assertFalse(class_filter('com.b.B'))
+        self.assertTrue(expand_filter('com.b.B'))
+        self.assertFalse(expand_filter('com.b.Hidden'))
+
+
+class DependencyGraphFilterTest(JavaProjectTestCase):
+    def setUp(self):
+        super(DependencyGraphFilterTest, self).setUp()
+        self.write_class('com.svc', 'UserService', 'private UserDao dao;', ['com.dao.UserDao'])
+        self.write_class('com.svc', 'Helper')
+        self.write_class('com.dao', 'UserDao', 'private Util util;', ['com.util.Util'])
+        self.write_class('com.util', 'Util')
+        self.class_map = get_proj_class_map(self.proj_dir)
+        self.impl_map = get_impl_map(self.class_map)
+        self.start_packages = [os.path.join(self.proj_dir, 'src', 'main', 'java', 'com', 'svc')]
+
+    def _graph(self, **filters):
+        class_filter, expand_filter = get_class_filters(**filters)
+        return get_dependency_graph(self.start_packages, self.class_map, self.impl_map, class_filter=class_filter,
+                                    expand_filter=expand_filter)
+
+    def test_include(self):
+        graph = self._graph(include=['com.svc.*Service'])
+        self.assertEqual(graph.roots, ['com.svc.UserService'])
+        # The dependencies out of the includes are still followed.
+        self.assertEqual(sorted(graph.adjacency.keys()), ['com.dao.UserDao', 'com.svc.UserService', 'com.util.Util'])
+
+    def test_exclude(self):
+        graph = self._graph(exclude=['com.util'])
+        self.assertEqual(sorted(graph.roots), ['com.svc.Helper', 'com.svc.UserService'])
+        self.assertEqual(graph.adjacency['com.dao.UserDao'], [])
+        self.assertNotIn('com.util.Util', graph.adjacency)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from daemon import AnalysisState, _get_proj_path, check_address, handle_request
+from tests.helper import JavaProjectTestCase
+
+
+class DaemonTest(JavaProjectTestCase):
+    def setUp(self):
+        super(DaemonTest, self).setUp()
+        self.write_class('com.a', 'A', 'private B b;')
+        self.write_class('com.a', 'B')
+        self.state = AnalysisState(self.proj_dir)
+        self.out_dir = tempfile.mkdtemp(prefix='deepcode_test_out_')
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+        super(DaemonTest, self).tearDown()
+
+    def _request(self, command, **params):
+        return handle_request(self.state, {'command': command, 'params': params})
+
+    def test_proj_path(self):
+        self.assertEqual(_get_proj_path(self.state, 'out/a.json'), os.path.join(self.proj_dir, 'out', 'a.json'))
+        self.assertEqual(_get_proj_path(self.state, u'a.json'), os.path.join(self.proj_dir, 'a.json'))
+        for path in (os.path.join(self.out_dir, 'a.json'), '../a.json', self.proj_dir + '_x/a.json'):
+            self.assertRaises(ValueError, _get_proj_path, self.state, path)
+
+    def test_symlink_out_of_project(self):
+        os.symlink(self.out_dir, os.path.join(self.proj_dir, 'link'))
+        self.assertRaises(ValueError, _get_proj_path, self.state, 'link/a.json')
+
+    def test_trace_output(self):
+        res = self._request('trace', start_packages=['src/main/java/com/a'], output_file='a.json')
+        self.assertTrue(res['ok'])
+        self.assertTrue(os.path.isfile(os.path.join(self.proj_dir, 'a.json')))
+        res = self._request('trace', start_packages=['src/main/java/com/a'],
+                            output_file=os.path.join(self.out_dir, 'a.json'))
+        self.assertFalse(res['ok'])
+        self.assertEqual(os.listdir(self.out_dir), [])
+
+    def test_start_packages(self):
+        res = self._request('expand', start_packages=[os.path.join(self.proj_dir, 'src/main/java/com/a')])
+        self.assertEqual(res, {'ok': True, 'result': [(1, 'com.a.A', 'com.a.B')]})
+        for command in ('dependency', 'expand', 'trace', 'ut_gen'):
+            res = self._request(command, start_packages=[self.out_dir], target_dir='ut')
+            self.assertFalse(res['ok'], command)
+            self.assertIn('out of the project', res['error'])
+
+    def test_update_out_of_project(self):
+        self.assertFalse(self._request('update', modified=[os.path.join(self.out_dir, 'A.java')])['ok'])
+
+    def test_bad_request(self):
+        for request in ([], 'ping', {'command': 'ping', 'params': ['x']}):
+            self.assertEqual(handle_request(self.state, request), {'ok': False, 'error': 'bad request'})
+        self.assertFalse(handle_request(self.state, {'command': 'x'})['ok'])
+        self.assertTrue(handle_request(self.state, {'command': 'ping'})['ok'])
+
+
+class CheckAddressTest(unittest.TestCase):
+    def test_loopback(self):
+        self.assertTrue(check_address('127.0.0.1:9000'))
+        self.assertTrue(check_address('/tmp/deepcode.sock'))
+        self.assertFalse(check_address('0.0.0.0:9000'))
+        self.assertTrue(check_address('0.0.0.0:9000', allow_remote=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
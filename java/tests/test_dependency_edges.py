@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from core import get_impl_map, get_proj_class_map, iter_dependency_edges
+from tests.helper import JavaProjectTestCase
+
+
+class IterDependencyEdgesTest(JavaProjectTestCase):
+    def setUp(self):
+        super(IterDependencyEdgesTest, self).setUp()
+        # A -> B -> C, X -> D, Y -> I -> J -> B
+        self.write_class('com.a', 'A', 'private B b;')
+        self.write_class('com.a', 'B', 'private C c;')
+        self.write_class('com.a', 'C')
+        self.write_class('com.a', 'X', 'private D d;')
+        self.write_class('com.a', 'D')
+        self.write_class('com.a', 'Y', 'private I i;')
+        self.write_class('com.a', 'I', header='public interface I')
+        self.write_class('com.a', 'J', 'private B b;', header='public class J implements I')
+        self.class_map = get_proj_class_map(self.proj_dir)
+        self.impl_map = get_impl_map(self.class_map)
+
+    def _edges(self, keys, **options):
+        return list(iter_dependency_edges(keys, self.class_map, self.impl_map, **options))
+
+    def test_breadth_first(self):
+        self.assertEqual(self._edges(['com.a.A', 'com.a.X']),
+                         [(1, 'com.a.A', 'com.a.B'), (1, 'com.a.X', 'com.a.D'), (2, 'com.a.B', 'com.a.C')])
+
+    def test_depth_first(self):
+        # The start classes are expanded in their order.
+        self.assertEqual(self._edges(['com.a.A', 'com.a.X'], depth_first=True),
+                         [(1, 'com.a.A', 'com.a.B'), (2, 'com.a.B', 'com.a.C'), (1, 'com.a.X', 'com.a.D')])
+
+    def test_max_depth(self):
+        self.assertEqual(self._edges(['com.a.A', 'com.a.X'], max_depth=1),
+                         [(1, 'com.a.A', 'com.a.B'), (1, 'com.a.X', 'com.a.D')])
+
+    def test_max_nodes(self):
+        self.assertEqual(self._edges(['com.a.A', 'com.a.X'], max_nodes=1), [(1, 'com.a.A', 'com.a.B')])
+        # The classes at max_depth are not expanded, so they don't count.
+        self.assertEqual(self._edges(['com.a.A', 'com.a.X'], max_depth=1, max_nodes=2),
+                         [(1, 'com.a.A', 'com.a.B'), (1, 'com.a.X', 'com.a.D')])
+
+    def test_interface(self):
+        # An interface and its implementation are on the same level.
+        self.assertEqual(self._edges(['com.a.Y']), [(1, 'com.a.Y', 'com.a.I'), (1, 'com.a.I', 'com.a.J'),
+                                                    (2, 'com.a.J', 'com.a.B'), (3, 'com.a.B', 'com.a.C')])
+
+    def test_shared_class(self):
+        # B is expanded once.
+        edges = self._edges(['com.a.A', 'com.a.Y'])
+        self.assertEqual([e for e in edges if e[1] == 'com.a.B'], [(2, 'com.a.B', 'com.a.C')])
+
+
+if __name__ == '__main__':
+    unittest.main()
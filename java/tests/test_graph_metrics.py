@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from graph_metrics import *
+from tests.helper import build_graph
+
+
+def _get_sorted_components(components):
+    return [sorted(e) for e in components]
+
+
+class StronglyConnectedComponentsTest(unittest.TestCase):
+    def test_components(self):
+        # 0 -> 1 -> 2 -> 0, 2 -> 3, 4 alone
+        components = get_strongly_connected_components([[1], [2], [0, 3], [], []])
+        self.assertEqual(_get_sorted_components(components), [[3], [0, 1, 2], [4]])
+
+    def test_reverse_topological_order(self):
+        # 0 -> 1 -> 2, 0 -> 2
+        components = get_strongly_connected_components([[1, 2], [2], []])
+        self.assertEqual(components, [[2], [1], [0]])
+
+    def test_self_loop(self):
+        self.assertEqual(get_strongly_connected_components([[0], [0]]), [[0], [1]])
+
+    def test_deep_chain(self):
+        # No recursion, so a chain longer than the recursion limit is fine.
+        n = 10000
+        components = get_strongly_connected_components([[i + 1] for i in range(n - 1)] + [[0]])
+        self.assertEqual(len(components), 1)
+        self.assertEqual(len(components[0]), n)
+
+
+class DependencyCyclesTest(unittest.TestCase):
+    def test_cycles(self):
+        graph = build_graph([
+            ('a.A', ['a.B', 'java.lang.String']),
+            ('a.B', ['a.C']),
+            ('a.C', ['a.A', 'a.D']),
+            ('a.D', ['a.D']),
+            ('a.E', ['a.A']),
+        ])
+        res = get_dependency_cycles(graph)
+        self.assertEqual(res['cycles'], [['a.A', 'a.B', 'a.C'], ['a.D']])
+        components = res['components']
+        self.assertEqual(sorted(components), [['a.A', 'a.B', 'a.C'], ['a.D'], ['a.E']])
+        # The edges go forward in the topological order.
+        edges = {(tuple(components[i]), tuple(components[j])) for i, j in res['edges']}
+        self.assertEqual(edges, {(('a.A', 'a.B', 'a.C'), ('a.D',)), (('a.E',), ('a.A', 'a.B', 'a.C'))})
+        self.assertTrue(all(i < j for i, j in res['edges']))
+
+    def test_no_cycles(self):
+        graph = build_graph([('a.A', ['a.B']), ('a.B', [])])
+        res = get_dependency_cycles(graph)
+        self.assertEqual(res['cycles'], [])
+        self.assertEqual(res['components'], [['a.A'], ['a.B']])
+        self.assertEqual(res['edges'], [(0, 1)])
+
+
+class GraphMetricsTest(unittest.TestCase):
+    def setUp(self):
+        # A -> B -> D, A -> C -> D, C <-> E
+        self.graph = build_graph([
+            ('a.A', ['a.B', 'a.C']),
+            ('a.B', ['a.D']),
+            ('a.C', ['a.D', 'a.E']),
+            ('a.D', []),
+            ('a.E', ['a.C']),
+        ])
+
+    def test_metrics(self):
+        metrics = get_graph_metrics(self.graph)
+        self.assertEqual(list(metrics.keys()), ['fan_in', 'transitive_fan_in', 'fan_out', 'paths', 'pagerank'])
+        self.assertEqual(metrics['fan_in'], {'a.A': 0, 'a.B': 1, 'a.C': 2, 'a.D': 2, 'a.E': 1})
+        self.assertEqual(metrics['transitive_fan_in'], {'a.A': 0, 'a.B': 1, 'a.C': 2, 'a.D': 4, 'a.E': 2})
+        self.assertEqual(metrics['fan_out'], {'a.A': 2, 'a.B': 1, 'a.C': 2, 'a.D': 0, 'a.E': 1})
+        # The cycle of C and E is counted as one node.
+        self.assertEqual(metrics['paths'], {'a.A': 1, 'a.B': 1, 'a.C': 1, 'a.D': 2, 'a.E': 1})
+        self.assertAlmostEqual(sum(metrics['pagerank'].values()), 1.0)
+        self.assertEqual(max(metrics['pagerank'], key=metrics['pagerank'].get), 'a.D')
+
+    def test_metric_names(self):
+        metrics = get_graph_metrics(self.graph, ('paths',))
+        self.assertEqual(list(metrics.keys()), ['paths'])
+        self.assertEqual(metrics['paths'], get_graph_metrics(self.graph)['paths'])
+
+    def test_top_metrics(self):
+        top = get_top_metrics(get_graph_metrics(self.graph, ('fan_in',)), 2)
+        # The ties are ordered by the class keys.
+        self.assertEqual(top['fan_in'], [('a.C', 2), ('a.D', 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
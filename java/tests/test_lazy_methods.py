@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from core import _format_code_lines, _get_java_class_entity, get_proj_class_map
+from lexer import blank_method_bodies, tokenize_java
+from tests.helper import JavaProjectTestCase
+
+BODY = '''
+    private Helper helper;
+    private String text = "{ ( ;";
+    private Runnable task = new Runnable() {{ init(); }};
+
+    public Service() throws Exception {
+        helper = new Helper();
+    }
+
+    @RequestMapping(value = "/x", method = {GET})
+    public String find(String name, int limit) {
+        if (limit > 0) {
+            return helper.find(name);
+        }
+        return text;
+    }
+
+    private Helper2 helper2;
+'''
+
+
+def _get_method_signatures(entity):
+    return [(e.method_name, e.params, e.ret_type) for e in entity.methods]
+
+
+class BlankMethodBodiesTest(unittest.TestCase):
+    def test_bodies(self):
+        source = 'class A {\n    int f(int a) {\n        return a; }\n    private B b;\n}\n'
+        lines = _format_code_lines(source, skip_method_bodies=True)
+        self.assertEqual([(i, t) for i, t, _ in lines],
+                         [(1, 'class A {'), (2, 'int f(int a) {'), (3, '}'), (4, 'private B b;'), (5, '}')])
+
+    def test_line_breaks(self):
+        source = 'class A {\n  void f() {\n  /* x\n  */ "a";\n  }\n}\n'
+        tokens = blank_method_bodies(tokenize_java(source))
+        self.assertEqual(''.join(e.text for e in tokens), 'class A {\n  void f() {\n\n\n}\n}\n')
+
+    def test_kept_blocks(self):
+        # Annotations, anonymous classes of the fields, lambdas and initializers are not method bodies.
+        source = ('@A(x = {1}) class A {\n  Runnable r = new R() { int i; };\n  Runnable l = () -> { int j; };\n'
+                  '  static { int k; }\n}\n')
+        tokens = blank_method_bodies(tokenize_java(source))
+        self.assertEqual(''.join(e.text for e in tokens), source)
+
+
+class LazyMethodsTest(JavaProjectTestCase):
+    def setUp(self):
+        super(LazyMethodsTest, self).setUp()
+        self.file_name = self.write_class('com.a', 'Service', BODY)
+
+    def test_same_as_eager(self):
+        eager = _get_java_class_entity(self.file_name)
+        lazy = _get_java_class_entity(self.file_name, lazy_methods=True)
+        self.assertEqual(lazy.fields, eager.fields)
+        self.assertIsNotNone(lazy.methods_location)
+        self.assertEqual(_get_method_signatures(lazy), _get_method_signatures(eager))
+        self.assertEqual([e.method_body for e in lazy.methods], [e.method_body for e in eager.methods])
+        self.assertIsNone(lazy.methods_location)
+
+    def test_touched_with_cache(self):
+        cache_dir = os.path.join(self.proj_dir, 'cache')
+        get_proj_class_map(self.proj_dir, cache_dir, lazy_methods=True)
+        stat = os.stat(self.file_name)
+        os.utime(self.file_name, (stat.st_atime, stat.st_mtime + 10))
+        stat = os.stat(self.file_name)
+        entity = get_proj_class_map(self.proj_dir, cache_dir, lazy_methods=True)['com.a.Service']
+        # The methods are still loaded by the offset.
+        self.assertEqual(entity.methods_location[3:], (stat.st_size, stat.st_mtime))
+        self.assertEqual([e[0] for e in _get_method_signatures(entity)], ['find'])
+
+    def test_changed_after_parse(self):
+        entity = _get_java_class_entity(self.file_name, lazy_methods=True)
+        self.write_class('com.a', 'Service', '\n\n' + BODY)
+        self.assertEqual([e[0] for e in _get_method_signatures(entity)], ['find'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from core import _format_code_lines
+from lexer import *
+
+SOURCE = '''package com.sample;
+
+import java.util.List; import java.util.Map;
+import com.sample.dao.UserDao;
+
+/**
+ * Users (with ; and { in the comment).
+ */
+@Service
+public class UserService extends BaseService implements IUserService {
+    private UserDao userDao; // the dao; of users
+    private String name = "a;b(c)"; private int count;
+    public Map<String, List<Long>> cache;
+
+    public UserService() {
+    }
+
+    /* block
+       comment */
+    public List<Long> find(String name,
+                           int limit) throws Exception {
+        int a = 1; int b = 2;
+        String s = "x(" + name + ")";
+        if (a > b) {
+            return userDao.find(name, limit);
+        } else {
+            userDao.save(s,
+                    a);
+        }
+        return null;
+    }
+}
+'''
+
+# Lines of the regex based _format_code_lines before the lexer.
+BASELINE_LINES = [
+    (1, 'package com.sample;'),
+    (3, 'import java.util.List;'),
+    (3, 'import java.util.Map;'),
+    (4, 'import com.sample.dao.UserDao;'),
+    (9, '@Service'),
+    (10, 'public class UserService extends BaseService implements IUserService {'),
+    (11, 'private UserDao userDao;'),
+    (12, 'private String name = "a;b(c)";'),
+    (12, 'private int count;'),
+    (13, 'public Map<String, List<Long>> cache;'),
+    (15, 'public UserService() {'),
+    (16, '}'),
+    (21, 'public List<Long> find(String name,int limit) throws Exception {'),
+    (22, 'int a = 1;'),
+    (22, 'int b = 2;'),
+    (23, 'String s = "x(" + name + ")";'),
+    (24, 'if (a > b) {'),
+    (25, 'return userDao.find(name, limit);'),
+    (26, '} else {'),
+    (28, 'userDao.save(s,a);'),
+    (29, '}'),
+    (30, 'return null;'),
+    (31, '}'),
+    (32, '}'),
+]
+
+
+class TokenizeJavaTest(unittest.TestCase):
+    def test_kinds(self):
+        tokens = tokenize_java('a = "x;" + \'(\'; // c {\nb();')
+        self.assertEqual([(e.kind, e.text) for e in tokens], [
+            (TOKEN_CODE, 'a = '), (TOKEN_STRING, '"x;"'), (TOKEN_CODE, ' + '), (TOKEN_CHAR, '\'(\''),
+            (TOKEN_CODE, '; '), (TOKEN_COMMENT, '// c {'), (TOKEN_CODE, '\nb();')])
+
+    def test_lines(self):
+        tokens = tokenize_java('/* a\n b */ x;\n"s"', 5)
+        self.assertEqual([e.line for e in tokens], [5, 6, 7])
+
+    def test_escaped_quote(self):
+        tokens = tokenize_java('s = "a\\"b;"; c;')
+        self.assertEqual(tokens[1], JavaToken(TOKEN_STRING, '"a\\"b;"', 1))
+
+    def test_unterminated_comment(self):
+        self.assertEqual(tokenize_java('a; /* b')[-1].kind, TOKEN_COMMENT)
+
+
+class FormatCodeLinesTest(unittest.TestCase):
+    def test_baseline(self):
+        self.assertEqual([(i, t) for i, t, _ in _format_code_lines(SOURCE)], BASELINE_LINES)
+
+    def test_masked(self):
+        lines = _format_code_lines(SOURCE)
+        for i, t, masked in lines:
+            self.assertEqual(len(t), len(masked))
+        self.assertEqual([e[2] for e in lines if e[0] == 12][0], 'private String name = "      ";')
+
+    def test_line_index(self):
+        lines = _format_code_lines('a;\nb;', 10)
+        self.assertEqual([(i, t) for i, t, _ in lines], [(10, 'a;'), (11, 'b;')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from core import discover_java_modules, get_proj_class_map, update_proj_class_map, walk_java_files
+from tests.helper import JavaProjectTestCase
+
+
+class JavaModulesTest(JavaProjectTestCase):
+    def setUp(self):
+        super(JavaModulesTest, self).setUp()
+        self.write_java('pom.xml', '<project/>')
+        self.write_java('libs/core/pom.xml', '<project/>')
+        self.write_class('com.core', 'Core', module='libs/core')
+        self.write_java('app/build.gradle', '')
+        self.write_class('com.app', 'App', 'private Core core;', ['com.core.Core'], module='app')
+        # A module named like an ignored directory, and a package named like it.
+        self.write_java('build/pom.xml', '<project/>')
+        self.write_class('com.gen.build', 'Gen', module='build')
+        # Build outputs and tests are not walked.
+        self.write_java('app/build/generated/com/app/Generated.java', 'package com.app;\npublic class Generated {}\n')
+        self.write_java('app/src/test/java/com/app/AppTest.java', 'package com.app;\npublic class AppTest {}\n')
+
+    def test_modules(self):
+        modules = discover_java_modules(self.proj_dir)
+        self.assertEqual([e.name for e in modules], ['.', 'app', 'build', os.path.join('libs', 'core')])
+        self.assertEqual(modules[0].source_dirs, [])
+        self.assertEqual(modules[1].source_dirs, [os.path.join(self.proj_dir, 'app', 'src', 'main', 'java')])
+
+    def test_walk(self):
+        files = sorted(os.path.relpath(e.path, self.proj_dir) for e in walk_java_files(self.proj_dir))
+        self.assertEqual(files, [os.path.join(*e) for e in [
+            ('app', 'src', 'main', 'java', 'com', 'app', 'App.java'),
+            ('build', 'src', 'main', 'java', 'com', 'gen', 'build', 'Gen.java'),
+            ('libs', 'core', 'src', 'main', 'java', 'com', 'core', 'Core.java')]])
+
+    def test_class_map(self):
+        class_map = get_proj_class_map(self.proj_dir)
+        self.assertEqual(sorted(class_map.keys()), ['com.app.App', 'com.core.Core', 'com.gen.build.Gen'])
+        self.assertEqual(class_map['com.app.App'].fields, {'core': ('com.core.Core', None)})
+        self.assertEqual(len(class_map.modules), 4)
+
+    def test_update_module_named_like_ignored_dir(self):
+        class_map = get_proj_class_map(self.proj_dir)
+        file_name = self.write_class('com.gen.build', 'Gen2', module='build')
+        generated = os.path.join(self.proj_dir, 'app/build/generated/com/app/Generated2.java')
+        self.write_java(generated, 'package com.app;\npublic class Generated2 {}\n')
+        self.assertEqual(update_proj_class_map(class_map, self.proj_dir, added=[file_name, generated]),
+                         {'com.gen.build.Gen', 'com.gen.build.Gen2'})
+
+    def test_module_caches(self):
+        cache_dir = os.path.join(self.proj_dir, 'cache')
+        get_proj_class_map(self.proj_dir, cache_dir)
+        # One cache of every module with classes.
+        self.assertEqual(len(os.listdir(cache_dir)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
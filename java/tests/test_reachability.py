@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from reachability import JavaReachabilityIndex, check_rules, parse_rules
+from tests.helper import build_graph
+
+
+class JavaReachabilityIndexTest(unittest.TestCase):
+    def setUp(self):
+        # web.A -> service.B -> dao.C, service.B <-> service.D, dao.E alone
+        self.index = JavaReachabilityIndex(build_graph([
+            ('com.web.A', ['com.service.B']),
+            ('com.service.B', ['com.dao.C', 'com.service.D']),
+            ('com.service.D', ['com.service.B']),
+            ('com.dao.C', ['java.lang.String']),
+            ('com.dao.E', []),
+        ]))
+
+    def test_depends_on(self):
+        self.assertTrue(self.index.depends_on('com.web.A', 'com.dao.C'))
+        self.assertTrue(self.index.depends_on('com.service.D', 'com.dao.C'))
+        self.assertFalse(self.index.depends_on('com.dao.C', 'com.web.A'))
+        self.assertFalse(self.index.depends_on('com.web.A', 'com.dao.E'))
+        # The classes out of the project are not indexed.
+        self.assertFalse(self.index.depends_on('com.dao.C', 'java.lang.String'))
+
+    def test_cycle(self):
+        self.assertTrue(self.index.depends_on('com.service.B', 'com.service.B'))
+        self.assertFalse(self.index.depends_on('com.web.A', 'com.web.A'))
+
+    def test_get_id_range(self):
+        self.assertEqual(self.index.get_keys(self.index.get_reachable_bits('com.web.A')),
+                         ['com.dao.C', 'com.service.B', 'com.service.D'])
+        start, end = self.index.get_id_range('com.service.*')
+        self.assertEqual(self.index.keys[start:end], ['com.service.B', 'com.service.D'])
+        self.assertEqual(self.index.get_id_range('com.x.*'), (5, 5))
+        self.assertEqual(self.index.get_id_range('*'), (0, 5))
+
+    def test_check_rules(self):
+        rules = parse_rules(['# layers', '', 'com.web.* -> com.dao.*', 'com.dao.* -> com.web.*', 'bad rule'])
+        self.assertEqual(rules, [('com.web.*', 'com.dao.*'), ('com.dao.*', 'com.web.*')])
+        res = check_rules(self.index, rules)
+        self.assertEqual([(e['source'], e['targets']) for e in res], [('com.web.A', ['com.dao.C'])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from core import get_impl_map, get_proj_class_map, update_proj_class_map
+from tests.helper import JavaProjectTestCase
+
+
+def _get_state(class_map):
+    return [(k, class_map.get_path_by_key(k), class_map[k].fields, class_map[k].class_package_map,
+             class_map[k].interfaces) for k in sorted(class_map)]
+
+
+class UpdateProjClassMapTest(JavaProjectTestCase):
+    def setUp(self):
+        super(UpdateProjClassMapTest, self).setUp()
+        self.write_class('com.a', 'I', header='public interface I')
+        self.write_class('com.a', 'A', header='public class A implements I')
+        self.c_file = self.write_class('com.b', 'C', 'private I i;', ['com.a.*'])
+        self.d_file = self.write_class('com.b', 'D', 'private C c;')
+        self.class_map = get_proj_class_map(self.proj_dir)
+        self.impl_map = get_impl_map(self.class_map)
+
+    def _check_update(self, **changed):
+        keys = update_proj_class_map(self.class_map, self.proj_dir, impl_map=self.impl_map, **changed)
+        class_map = get_proj_class_map(self.proj_dir)
+        self.assertEqual(_get_state(self.class_map), _get_state(class_map))
+        self.assertEqual(self.impl_map, get_impl_map(class_map))
+        return keys
+
+    def test_added(self):
+        b_file = self.write_class('com.a', 'B', header='public class B implements I')
+        keys = self._check_update(added=[b_file])
+        # C sees B through com.a.*, D isn't parsed again.
+        self.assertEqual(keys, {'com.a.B', 'com.a.A', 'com.a.I', 'com.b.C'})
+
+    def test_modified(self):
+        self.write_class('com.b', 'C', 'private A a;', ['com.a.*'])
+        self.assertEqual(self._check_update(modified=[self.c_file]), {'com.b.C'})
+
+    def test_deleted(self):
+        os.remove(self.d_file)
+        self.assertEqual(self._check_update(deleted=[self.d_file]), {'com.b.D', 'com.b.C'})
+
+    def test_renamed(self):
+        os.remove(self.d_file)
+        e_file = self.write_class('com.b', 'E', 'private C c;')
+        self._check_update(added=[os.path.relpath(e_file, self.proj_dir)], deleted=[self.d_file])
+
+    def test_impl_order(self):
+        # The first implementation is the dependency of the interface, so the order is the one of a full parse.
+        a0_file = self.write_class('com.a', 'A0', header='public class A0 implements I')
+        self._check_update(added=[a0_file])
+        self.assertEqual(sorted(self.impl_map['com.a.I']), ['com.a.A', 'com.a.A0'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,11 +2,15 @@
 
 import json
 import sys
-from collections import defaultdict
 
+import instrument
+from cli_helper import *
 from core import *
+from graph_export import EXPORT_FORMATS, export_graph
+from graph_metrics import DEFAULT_TOP_N, get_dependency_cycles, get_graph_metrics, get_top_metrics
 
 TOP_DEP_KEY = 'TopDep'
+DEFAULT_TREE_OUTPUT = 'tracer_result2.json'
 
 
 def _show_dep_helper(dep, level, simplify):
@@ -32,60 +36,178 @@ def _simplify_dep(dep):
     return res
 
 
-def _get_dep_count_helper(dep, dep_count_map):
-    if not dep or dep_count_map is None:
-        return
-    for k, v in dep.items():
-        dep_count_map[k] += 1
-        _get_dep_count_helper(v, dep_count_map)
+def _get_top_dep(top_metrics, simplify):
+    # The classes reached by the most dependency paths.
+    return map(lambda x: '%s,%s' % (x[0][x[0].rindex('.') + 1:] if simplify else x[0], x[1]), top_metrics['paths'])
+
 
+def _write_rank(top_metrics, output_file):
+    res = OrderedDict((k, [OrderedDict([('class', e[0]), ('value', e[1])]) for e in v])
+                      for k, v in top_metrics.items())
+    with open(output_file, 'w') as f:
+        json.dump(res, f, indent=4)
 
-def _get_top_dep(dep, top_dep_n):
-    d = defaultdict(int)
-    _get_dep_count_helper(dep, d)
-    items = sorted(map(lambda x: (x[1], x[0]), d.items()), reverse=True)
-    return map(lambda x: '%s,%s' % (x[1], x[0]), items[:top_dep_n])
 
+def _write_cycles(cycles, output_file):
+    with open(output_file, 'w') as f:
+        json.dump(cycles, f, indent=4)
 
-def _show_dep(dep, simplify=False, print_info=False, write_info=False, top_dep_n=None):
+
+def _show_dep(dep, simplify=False, print_info=False, output_file=None, top_metrics=None):
     if not dep:
-        return ''
+        return
     if simplify:
         dep = _simplify_dep(dep)
-    if top_dep_n:
-        top_dep_res = _get_top_dep(dep, top_dep_n)
-        dep[TOP_DEP_KEY] = top_dep_res
-    res = json.dumps(dep, indent=4, sort_keys=True)
+    if top_metrics:
+        dep[TOP_DEP_KEY] = _get_top_dep(top_metrics, simplify)
     if print_info:
-        print(res)
-    if write_info:
-        with open('tracer_result2.json', 'w') as f:
-            f.writelines(json.dumps(dep, indent=4, sort_keys=True))
-    return res
+        print(json.dumps(dep, indent=4, sort_keys=True))
+    if output_file:
+        # json.dump writes the chunks of the encoder, the whole text is never built.
+        with open(output_file, 'w') as f:
+            json.dump(dep, f, indent=4, sort_keys=True)
+
+
+def trace(start_packages, proj_dir, filter_classes_func=None, max_depth=None, output_file=DEFAULT_TREE_OUTPUT,
+          export_file=None, export_format=None, compress=None, top_n=DEFAULT_TOP_N, rank_file=None,
+          cycles_file=None, expand_filter=None, **class_map_options):
+    """
+    Trace the dependency of the classes in the start packages, the outputs are the ones of trace_by_class_map.
+    """
+    # The dependency only needs the class headers.
+    with instrument.phase('get_proj_class_map'):
+        class_map = get_proj_class_map(proj_dir, lazy_methods=True, **class_map_options)
+    with instrument.phase('get_impl_map'):
+        impl_map = get_impl_map(class_map)
+    trace_by_class_map(start_packages, class_map, impl_map, filter_classes_func, max_depth, output_file, export_file,
+                       export_format, compress, top_n, rank_file, cycles_file, expand_filter)
+
+
+def trace_by_class_map(start_packages, class_map, impl_map, filter_classes_func=None, max_depth=None,
+                       output_file=DEFAULT_TREE_OUTPUT, export_file=None, export_format=None, compress=None,
+                       top_n=DEFAULT_TOP_N, rank_file=None, cycles_file=None, expand_filter=None):
+    """
+    Trace the dependency of the classes in the start packages by the parsed project.
+
+    :param filter_classes_func: predicate of the start class keys, see core.get_class_filters
+    :param output_file: file of the dependency trees in JSON, the trees are not rendered if it's None
+    :param export_file: file of the dependency graph, which is written by graph_export.export_graph
+    :param top_n: count of the top classes of every rank metric
+    :param rank_file: file of the top classes of every metric of graph_metrics.get_graph_metrics in JSON
+    :param cycles_file: file of the dependency cycles of graph_metrics.get_dependency_cycles in JSON
+    :param expand_filter: predicate of the class keys, the other classes are neither expanded nor kept as dependencies
+    """
+    with instrument.phase('get_dependency'):
+        graph = get_dependency_graph(start_packages, class_map, impl_map, class_filter=filter_classes_func,
+                                     expand_filter=expand_filter)
+    if export_file:
+        with instrument.phase('export_graph'):
+            export_graph(graph, export_file, export_format, compress)
+    top_metrics = None
+    if rank_file or output_file:
+        with instrument.phase('rank'):
+            # TopDep of the trees only needs the paths.
+            top_metrics = get_top_metrics(get_graph_metrics(graph, None if rank_file else ('paths',)), top_n)
+    if rank_file:
+        _write_rank(top_metrics, rank_file)
+    if cycles_file:
+        # A cycle may go through any implementation of an interface, not only the first one.
+        with instrument.phase('find_cycles'):
+            cycles = get_dependency_cycles(get_dependency_graph(start_packages, class_map, impl_map, True,
+                                                                filter_classes_func, expand_filter))
+        _write_cycles(cycles, cycles_file)
+    if not output_file:
+        return
+    # Only the rendered tree grows by the paths, the graph expands every class once.
+    with instrument.phase('render_dep_tree'):
+        dep = graph.to_tree(max_depth=max_depth)
+    with instrument.phase('show_dep'):
+        _show_dep(dep, simplify=True, output_file=output_file, top_metrics=top_metrics)
+
 
+def trace_edges(start_packages, class_map, impl_map, output=sys.stdout, class_filter=None, expand_filter=None,
+                **options):
+    """
+    Write the dependency edges of the classes in the start packages as they are expanded, one "depth parent child"
+    line per edge separated by tabs.
 
-def trace(start_packages, proj_dir, filter_classes_func=None):
-    class_map = get_proj_class_map(proj_dir)
-    impl_map = get_impl_map(class_map)
-    dep = get_dependency(start_packages, class_map, impl_map)
-    if filter_classes_func:
-        dep = {k: v for k, v in dep.items() if filter_classes_func(k)}
-    _show_dep(dep, simplify=True, write_info=True, top_dep_n=30)
+    :param class_filter: predicate of the start class keys, see core.get_class_filters
+    :param expand_filter: predicate of the class keys, the edges to the other classes are not followed
+    :param options: max_depth, max_nodes and depth_first of core.iter_dependency_edges
+    """
+    keys = get_start_class_keys(start_packages, class_map, class_filter)
+    for depth, parent, child in iter_dependency_edges(keys, class_map, impl_map, include=expand_filter, **options):
+        output.write('%d\t%s\t%s\n' % (depth, parent, child))
+        output.flush()
 
 
 def main():
-    if len(sys.argv) < 2:
-        logging.error('Please first input the start analyse Java packages.')
-        sys.exit(-1)
-    if len(sys.argv) < 3:
-        logging.error('Please then input the analyse project dir.')
-        sys.exit(-1)
-    start_package_dirs = sys.argv[1].split(',') if sys.argv[1] else None
-    proj_dir = sys.argv[2]
+    parser = build_arg_parser('Track the dependency tree of Java classes or interfaces.')
+    parser.add_argument('start_packages', help='comma separated start analyse Java package directories')
+    parser.add_argument('proj_dir', help='analyse project directory')
+    parser.add_argument('--max-depth', type=int, help='count of the field levels in the dependency trees, no limit '
+                                                      'if it\'s not given')
+    parser.add_argument('-o', '--output', default=DEFAULT_TREE_OUTPUT,
+                        help='file of the dependency trees in JSON (default: %(default)s)')
+    parser.add_argument('--no-tree', action='store_true', help='don\'t render the dependency trees, e.g. only export')
+    parser.add_argument('--export', metavar='FILE', help='stream the dependency graph to the file')
+    parser.add_argument('--export-format', choices=sorted(EXPORT_FORMATS.keys()),
+                        help='format of the exported graph, guessed by the file extension if it\'s not given')
+    parser.add_argument('--gzip', action='store_true', default=None,
+                        help='gzip the exported graph, which is also done for the .gz files')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_N,
+                        help='count of the top classes of every rank metric (default: %(default)s)')
+    parser.add_argument('--rank-output', metavar='FILE', help='write the top classes by the fan-in, transitive '
+                                                              'fan-in, fan-out, path count and PageRank in JSON')
+    parser.add_argument('--cycles', metavar='FILE', help='write the dependency cycles and the condensed DAG of the '
+                                                         'classes in JSON')
+    parser.add_argument('--edges', action='store_true',
+                        help='print the dependency edges as they are expanded instead of writing the outputs')
+    parser.add_argument('--max-nodes', type=int, help='count of the classes to expand at most with --edges')
+    parser.add_argument('--depth-first', action='store_true', help='expand depth first with --edges')
+    add_class_filter_arguments(parser)
+    args = parser.parse_args()
+    setup_logging(args)
+    setup_instrument(args)
+    start_package_dirs = args.start_packages.split(',') if args.start_packages else None
+    proj_dir = args.proj_dir
     if not start_package_dirs or not proj_dir:
         logging.error('Analyse Java packages or project dir is empty')
         sys.exit(-1)
-    trace(start_package_dirs, proj_dir, None)
+    filter_options = get_class_filter_options(args)
+    class_filter, expand_filter = get_class_filters(**filter_options)
+    if args.edges:
+        edge_options = {
+            'max_depth': args.max_depth,
+            'max_nodes': args.max_nodes,
+            'depth_first': args.depth_first,
+        }
+        if args.daemon:
+            edge_options['start_packages'] = [get_abs_path(e) for e in start_package_dirs]
+            edge_options.update(filter_options)
+            for depth, parent, child in request_daemon(args, 'expand', **edge_options):
+                print('%d\t%s\t%s' % (depth, parent, child))
+            return
+        with instrument.phase('get_proj_class_map'):
+            class_map = get_proj_class_map(proj_dir, lazy_methods=True, **get_class_map_options(args))
+        with instrument.phase('get_impl_map'):
+            impl_map = get_impl_map(class_map)
+        with instrument.phase('trace_edges'):
+            trace_edges(start_package_dirs, class_map, impl_map, class_filter=class_filter,
+                        expand_filter=expand_filter, **edge_options)
+        write_instrument_report(args)
+        return
+    output_file = None if args.no_tree else args.output
+    if args.daemon:
+        request_daemon(args, 'trace', start_packages=[get_abs_path(e) for e in start_package_dirs],
+                       max_depth=args.max_depth, output_file=get_abs_path(output_file),
+                       export_file=get_abs_path(args.export), export_format=args.export_format, compress=args.gzip,
+                       top_n=args.top, rank_file=get_abs_path(args.rank_output),
+                       cycles_file=get_abs_path(args.cycles), **filter_options)
+        return
+    trace(start_package_dirs, proj_dir, class_filter, args.max_depth, output_file, args.export, args.export_format,
+          args.gzip, args.top, args.rank_output, args.cycles, expand_filter, **get_class_map_options(args))
+    write_instrument_report(args)
 
 
 if __name__ == '__main__':
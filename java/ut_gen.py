@@ -4,6 +4,8 @@ import sys
 import random
 import string
 
+import instrument
+from cli_helper import *
 from core import *
 
 DEFAULT_UT_IMPORT_MAP = {
@@ -40,12 +42,11 @@ def _setup_method_deps_helper(entity, method, visited):
     method.dep_info = list(res)
     if 'self_methods' in method.method_body and method.method_body['self_methods']:
         self_methods = method.method_body['self_methods']
-        mapped_methods = {(e.method_name, len(e.params)): e for e in
-                          entity.methods}  # set(map(lambda x: (x.method_name, len(x.params)), entity.methods))
-        self_methods &= set(mapped_methods.keys())
+        mapped_methods = entity.method_index.key_method_map
+        self_methods.intersection_update(mapped_methods)
         for self_method in self_methods:
             _setup_method_deps_helper(entity, mapped_methods[self_method], visited)
-            if 'dep_info' in mapped_methods[self_method].__dict__:
+            if mapped_methods[self_method].dep_info is not None:
                 method.dep_info += mapped_methods[self_method].dep_info
     visited.remove((method.method_name, len(method.params)))
 
@@ -107,8 +108,7 @@ def _get_non_void_invoke_methods(class_type, invoke_methods, class_map):
     if not class_type or not invoke_methods or not class_map or class_type not in class_map:
         return set()
     entity = class_map[class_type]
-    return set(filter(lambda x: (x.method_name, len(x.params)) in invoke_methods and x.ret_type != 'void',
-                      entity.methods))
+    return entity.method_index.get_non_void_methods(invoke_methods)
 
 
 def _build_random_string(n):
@@ -189,7 +189,7 @@ def _build_ut_code(entity, class_map, ut_import_map, ut_class_name, public_metho
     main_code += ['public class %s {' % ut_class_name]
 
     # dep info
-    methods_contain_dep_info = filter(lambda x: 'dep_info' in x.__dict__, public_methods)
+    methods_contain_dep_info = filter(lambda x: x.dep_info is not None, public_methods)
     # mocked fields
     mocked_fields_info = set()
     for method in methods_contain_dep_info:
@@ -236,7 +236,7 @@ def _build_ut_code(entity, class_map, ut_import_map, ut_class_name, public_metho
         #     'external_vars'] if 'external_vars' in public_method.method_body else []
         # external_vars = {k: v for k, v in external_vars.items() if 'class_type' in v and v['class_type'] != '?'}
         external_invoke_methods_map = {}
-        for dep_info in (public_method.dep_info if 'dep_info' in public_method.__dict__ else []):
+        for dep_info in (public_method.dep_info or []):
             if 'class_type' not in dep_info or dep_info['class_type'] == '?':
                 continue
             class_type = dep_info['class_type']
@@ -344,42 +344,77 @@ def _ut_gen_build(entity, class_map, impl_map, target_dir, interface_methods=Non
         f.writelines(res)
 
 
-def _ut_gen_by_package(start_package, class_map, impl_map, target_dir, filter_classes_func=None):
-    if not start_package or not class_map or not impl_map or not target_dir:
-        return
-    for sub_dir in filter(filter_classes_func, get_dir_java_files(start_package)):
-        key = get_java_class_entity_key_by_directory(sub_dir)
-        if key not in class_map:
-            logging.error('%s not in class_map, dir is: %s' % (key, sub_dir))
-            return None
-        entity = class_map[key]
-        _ut_gen_build(entity, class_map, impl_map, target_dir)
+def _get_ut_entity_keys(start_packages, class_map, impl_map, filter_classes_func=None, class_filter=None):
+    """
+    Get the keys of the classes whose unit testing is written, the unit testing of an interface is the one of its
+    first implementation.
+    """
+    res = []
+    for key in get_start_class_keys(start_packages, class_map, class_filter, filter_classes_func):
+        if class_map[key].class_type == 1:
+            if key not in impl_map:
+                continue
+            key = impl_map[key][0]
+        if key in class_map:
+            res.append(key)
+    return res
+
 
+def ut_gen_by_class_map(start_packages, class_map, impl_map, target_dir, filter_classes_func=None, class_filter=None):
+    """
+    Write the unit testing of the classes in the start packages, whose method dependencies are set up.
 
-def ut_gen(start_packages, proj_dir, target_dir, filter_classes_func=None):
-    class_map = get_proj_class_map(proj_dir)
-    setup_class_map_method_dep(class_map)
-    impl_map = get_impl_map(class_map)
-    for package in start_packages:
-        _ut_gen_by_package(package, class_map, impl_map, target_dir, filter_classes_func)
+    :param filter_classes_func: predicate of the Java file paths in the start packages to keep
+    :param class_filter: predicate of the class keys in the start packages to keep, e.g. of core.get_class_filter
+    """
+    if not class_map or not impl_map or not target_dir:
+        return
+    for key in get_start_class_keys(start_packages, class_map, class_filter, filter_classes_func):
+        _ut_gen_build(class_map[key], class_map, impl_map, target_dir)
+
+
+def ut_gen(start_packages, proj_dir, target_dir, filter_classes_func=None, class_filter=None, **class_map_options):
+    """
+    Write the unit testing of the classes in the start packages. The methods of a class are parsed on the first
+    access, and only the method dependencies of the tested classes are set up, so the other classes, e.g. the ones
+    rejected by the filters, are only parsed by their headers.
+
+    :param filter_classes_func: predicate of the Java file paths in the start packages to keep
+    :param class_filter: predicate of the class keys in the start packages to keep, e.g. of core.get_class_filter
+    """
+    with instrument.phase('get_proj_class_map'):
+        class_map = get_proj_class_map(proj_dir, lazy_methods=True, **class_map_options)
+    with instrument.phase('get_impl_map'):
+        impl_map = get_impl_map(class_map)
+    with instrument.phase('setup_class_map_method_dep'):
+        setup_class_map_method_dep(class_map, _get_ut_entity_keys(start_packages, class_map, impl_map,
+                                                                  filter_classes_func, class_filter))
+    with instrument.phase('ut_gen'):
+        ut_gen_by_class_map(start_packages, class_map, impl_map, target_dir, filter_classes_func, class_filter)
 
 
 def main():
-    if len(sys.argv) < 2:
-        logging.error('Please first input the Java interface directories which needs UT.')
-        sys.exit(-1)
-    if len(sys.argv) < 3:
-        logging.error('Please then input the analyse project dir.')
-        sys.exit(-1)
-    if len(sys.argv) < 4:
-        logging.error('Please input the target UT directories')
-    start_package_dirs = sys.argv[1].split(',') if sys.argv[1] else None
-    proj_dir = sys.argv[2]
-    target_dir = sys.argv[3]
+    parser = build_arg_parser('Automatically write the unit testing of Java classes or interfaces.')
+    parser.add_argument('start_packages', help='comma separated Java interface directories which needs UT')
+    parser.add_argument('proj_dir', help='analyse project directory')
+    parser.add_argument('target_dir', help='target UT directory')
+    add_class_filter_arguments(parser)
+    args = parser.parse_args()
+    setup_logging(args)
+    setup_instrument(args)
+    start_package_dirs = args.start_packages.split(',') if args.start_packages else None
+    proj_dir = args.proj_dir
+    target_dir = args.target_dir
     if not start_package_dirs or not proj_dir or not target_dir:
         logging.error('Analyse Java packages or project dir or target UT directory is empty')
         sys.exit(-1)
-    ut_gen(start_package_dirs, proj_dir, target_dir, None)
+    if args.daemon:
+        request_daemon(args, 'ut_gen', start_packages=[get_abs_path(e) for e in start_package_dirs],
+                       target_dir=get_abs_path(target_dir), **get_class_filter_options(args))
+        return
+    ut_gen(start_package_dirs, proj_dir, target_dir, class_filter=get_class_filter(**get_class_filter_options(args)),
+           **get_class_map_options(args))
+    write_instrument_report(args)
 
 
 if __name__ == '__main__':